@@ -0,0 +1,492 @@
+# -*- coding: utf-8 -*-
+
+"""
+in-process CalDAV stand-in for load and latency tests.
+
+supports principal and calendar discovery (PROPFIND), calendar-query REPORTs with time ranges and text matches,
+calendar-multiget, sync-collection, GET, PUT and DELETE. latency, jitter and error rate are configurable.
+"""
+
+# python lib
+from hashlib import md5
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+import random
+import threading
+import time
+import uuid
+
+# own code
+from chronos.ics_reader import IcsStream, event_header, parse_date_value
+
+
+DAV = "DAV:"
+CALDAV = "urn:ietf:params:xml:ns:caldav"
+CALSERVER = "http://calendarserver.org/ns/"
+NAMESPACES = {DAV: "D", CALDAV: "C", CALSERVER: "CS"}
+
+PRINCIPAL_PATH = "/dav/principals/{user}/"
+HOME_PATH = "/dav/calendars/{user}/"
+SYNC_TOKEN_PREFIX = "http://chronos.invalid/sync/"
+
+
+def qname(tag: str) -> str:
+    """prefixed name of a tag in clark notation"""
+    namespace, _, name = tag[1:].partition("}")
+    return f"{NAMESPACES.get(namespace, 'D')}:{name}"
+
+
+def etag_of(data: str) -> str:
+    return f'"{md5(data.encode("utf-8")).hexdigest()}"'
+
+
+class MockResource:
+    __slots__ = ("data", "etag", "version", "start", "end", "properties")
+
+    def __init__(self, data: str, version: int):
+        self.data = data
+        self.etag = etag_of(data)
+        self.version = version
+
+        header: dict[str, str] = {}
+        for block in IcsStream(data.splitlines()).events():
+            header = event_header(block)
+            break
+        self.properties = header
+        self.start = parse_date_value(header.get("DTSTART", ""))
+        self.end = parse_date_value(header.get("DTEND", "")) or self.start
+
+
+class MockCalendar:
+    """calendar collection with a change log for sync-collection"""
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.version = 1
+        self.resources: dict[str, MockResource] = {}
+        # href -> version of deletion
+        self.deleted: dict[str, int] = {}
+
+    @property
+    def ctag(self) -> str:
+        return f'"{self.version}"'
+
+    @property
+    def sync_token(self) -> str:
+        return f"{SYNC_TOKEN_PREFIX}{self.version}"
+
+    def put(self, href: str, data: str) -> MockResource:
+        self.version += 1
+        resource = MockResource(data, self.version)
+        self.resources[href] = resource
+        self.deleted.pop(href, None)
+        return resource
+
+    def delete(self, href: str) -> bool:
+        if self.resources.pop(href, None) is None:
+            return False
+        self.version += 1
+        self.deleted[href] = self.version
+        return True
+
+
+class RequestLog:
+    """duration, status and size of every handled request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries: list[tuple[str, int, float, int]] = []
+
+    def add(self, method: str, status: int, duration: float, size: int) -> None:
+        with self._lock:
+            self.entries.append((method, status, duration, size))
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries = []
+
+    def summary(self) -> dict:
+        with self._lock:
+            entries = list(self.entries)
+        result = {"requests": len(entries), "errors": sum(1 for entry in entries if entry[1] >= 500), "bytes_sent": sum(entry[3] for entry in entries)}
+        methods: dict[str, list[float]] = {}
+        for method, _, duration, _ in entries:
+            methods.setdefault(method, []).append(duration)
+        result["methods"] = {method: {"count": len(durations), **percentiles(durations)} for method, durations in methods.items()}
+        result["latency"] = percentiles([entry[2] for entry in entries])
+        return result
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def pick(fraction: float) -> float:
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": values[-1]}
+
+
+class MockCalDAVServer:
+    """
+    serves calendars of one user on 127.0.0.1. point cal_primary at MockCalDAVServer.url.
+    every request is delayed by latency plus exponentially distributed jitter (mean jitter seconds)
+    and fails with 503 at the given error rate
+    """
+
+    def __init__(self, user: str = "chronos", latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int | None = None):
+        self.user = user
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.calendars: dict[str, MockCalendar] = {}
+        self.log = RequestLog()
+
+        handler = type("BoundHandler", (MockCalDAVHandler,), {"mock": self})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/dav/"
+
+    @property
+    def principal_path(self) -> str:
+        return PRINCIPAL_PATH.format(user=self.user)
+
+    @property
+    def home_path(self) -> str:
+        return HOME_PATH.format(user=self.user)
+
+    def add_calendar(self, name: str, resources: list[str] | None = None) -> MockCalendar:
+        calendar = MockCalendar(name, f"{self.home_path}{uuid.uuid4()}/")
+        for data in resources or []:
+            calendar.put(f"{calendar.path}{uuid.uuid4()}.ics", data)
+        with self.lock:
+            self.calendars[calendar.path] = calendar
+        return calendar
+
+    def calendar_by_name(self, name: str) -> MockCalendar | None:
+        return next((calendar for calendar in self.calendars.values() if calendar.name == name), None)
+
+    def delay(self) -> None:
+        with self.lock:
+            delay = self.latency + (self.random.expovariate(1 / self.jitter) if self.jitter > 0 else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def should_fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def start(self) -> "MockCalDAVServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-caldav", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class MockCalDAVHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    mock: MockCalDAVServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self, method: str) -> None:
+        start = time.perf_counter()
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        self.mock.delay()
+        if self.mock.should_fail():
+            status, headers, payload = 503, {}, b"Service Unavailable"
+        else:
+            path = unquote(urlparse(self.path).path)
+            with self.mock.lock:
+                status, headers, payload = getattr(self, f"_{method.lower()}")(path, body)
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if method != "HEAD":
+            self.wfile.write(payload)
+        self.mock.log.add(method, status, time.perf_counter() - start, len(payload))
+
+    def do_OPTIONS(self):
+        self._handle("OPTIONS")
+
+    def do_PROPFIND(self):
+        self._handle("PROPFIND")
+
+    def do_REPORT(self):
+        self._handle("REPORT")
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    # responses
+
+    @staticmethod
+    def _multistatus(responses: list[str], extra: str = "") -> tuple[int, dict, bytes]:
+        xmlns = " ".join(f'xmlns:{prefix}="{namespace}"' for namespace, prefix in NAMESPACES.items())
+        payload = f'<?xml version="1.0" encoding="utf-8"?>\n<D:multistatus {xmlns}>{"".join(responses)}{extra}</D:multistatus>'
+        return 207, {"Content-Type": 'application/xml; charset="utf-8"'}, payload.encode("utf-8")
+
+    @staticmethod
+    def _response(href: str, found: dict[str, str], missing: list[str] = ()) -> str:
+        result = f"<D:response><D:href>{escape(href)}</D:href>"
+        if found:
+            props = "".join(f"<{qname(tag)}>{value}</{qname(tag)}>" if value else f"<{qname(tag)}/>" for tag, value in found.items())
+            result += f"<D:propstat><D:prop>{props}</D:prop><D:status>HTTP/1.1 200 OK</D:status></D:propstat>"
+        if missing:
+            props = "".join(f"<{qname(tag)}/>" for tag in missing)
+            result += f"<D:propstat><D:prop>{props}</D:prop><D:status>HTTP/1.1 404 Not Found</D:status></D:propstat>"
+        return result + "</D:response>"
+
+    @staticmethod
+    def _status_response(href: str, status: str) -> str:
+        return f"<D:response><D:href>{escape(href)}</D:href><D:status>HTTP/1.1 {status}</D:status></D:response>"
+
+    @staticmethod
+    def _requested_props(root: ElementTree.Element | None) -> list[str]:
+        if root is None:
+            return []
+        prop = root.find(f"{{{DAV}}}prop")
+        return [child.tag for child in prop] if prop is not None else []
+
+    # properties
+
+    def _properties(self, path: str) -> dict[str, str] | None:
+        mock = self.mock
+        common = {
+            f"{{{DAV}}}current-user-principal": f"<D:href>{mock.principal_path}</D:href>",
+            f"{{{CALDAV}}}calendar-home-set": f"<D:href>{mock.home_path}</D:href>",
+        }
+        if path in ("/", "/dav/", mock.principal_path):
+            resourcetype = "<D:collection/><D:principal/>" if path == mock.principal_path else "<D:collection/>"
+            return {f"{{{DAV}}}resourcetype": resourcetype, f"{{{DAV}}}displayname": mock.user, **common}
+        if path == mock.home_path:
+            return {f"{{{DAV}}}resourcetype": "<D:collection/>", **common}
+
+        calendar = mock.calendars.get(path)
+        if calendar is not None:
+            return {
+                f"{{{DAV}}}resourcetype": "<D:collection/><C:calendar/>",
+                f"{{{DAV}}}displayname": escape(calendar.name),
+                f"{{{CALSERVER}}}getctag": escape(calendar.ctag),
+                f"{{{DAV}}}sync-token": escape(calendar.sync_token),
+                f"{{{CALDAV}}}supported-calendar-component-set": '<C:comp name="VEVENT"/>',
+                **common,
+            }
+
+        calendar, resource = self._resource(path)
+        if resource is not None:
+            return {
+                f"{{{DAV}}}resourcetype": "",
+                f"{{{DAV}}}getetag": escape(resource.etag),
+                f"{{{DAV}}}getcontenttype": "text/calendar; charset=utf-8; component=vevent",
+            }
+        return None
+
+    def _resource(self, path: str) -> tuple[MockCalendar | None, MockResource | None]:
+        calendar = self.mock.calendars.get(path.rsplit("/", 1)[0] + "/")
+        if calendar is None:
+            return None, None
+        return calendar, calendar.resources.get(path)
+
+    def _resource_props(self, resource: MockResource, requested: list[str]) -> tuple[dict[str, str], list[str]]:
+        found, missing = {}, []
+        for tag in requested:
+            if tag == f"{{{DAV}}}getetag":
+                found[tag] = escape(resource.etag)
+            elif tag == f"{{{CALDAV}}}calendar-data":
+                found[tag] = escape(resource.data)
+            else:
+                missing.append(tag)
+        return found, missing
+
+    # methods
+
+    def _options(self, path, body):
+        return 200, {"DAV": "1, 2, 3, calendar-access", "Allow": "OPTIONS, GET, PUT, DELETE, PROPFIND, REPORT"}, b""
+
+    def _propfind(self, path, body):
+        root = ElementTree.fromstring(body) if body else None
+        requested = self._requested_props(root)
+        depth = self.headers.get("Depth", "0")
+
+        paths = [path]
+        if depth == "1":
+            if path == self.mock.home_path:
+                paths += list(self.mock.calendars)
+            elif path in self.mock.calendars:
+                paths += list(self.mock.calendars[path].resources)
+
+        responses = []
+        for current in paths:
+            properties = self._properties(current)
+            if properties is None:
+                if current == path:
+                    return 404, {}, b""
+                continue
+            if not requested:
+                responses.append(self._response(current, properties))
+                continue
+            found = {tag: properties[tag] for tag in requested if tag in properties}
+            responses.append(self._response(current, found, [tag for tag in requested if tag not in properties]))
+        return self._multistatus(responses)
+
+    def _report(self, path, body):
+        calendar = self.mock.calendars.get(path)
+        if calendar is None:
+            return 404, {}, b""
+        root = ElementTree.fromstring(body)
+        if root.tag == f"{{{DAV}}}sync-collection":
+            return self._sync_collection(calendar, root)
+        if root.tag == f"{{{CALDAV}}}calendar-multiget":
+            return self._multiget(calendar, root)
+        return self._calendar_query(calendar, root)
+
+    def _calendar_query(self, calendar: MockCalendar, root: ElementTree.Element):
+        requested = self._requested_props(root) or [f"{{{DAV}}}getetag"]
+
+        time_range = root.find(f".//{{{CALDAV}}}time-range")
+        range_start = parse_date_value(time_range.get("start", "")) if time_range is not None else None
+        range_end = parse_date_value(time_range.get("end", "")) if time_range is not None else None
+
+        text_matches = []
+        for prop_filter in root.iter(f"{{{CALDAV}}}prop-filter"):
+            text_match = prop_filter.find(f"{{{CALDAV}}}text-match")
+            is_not_defined = prop_filter.find(f"{{{CALDAV}}}is-not-defined") is not None
+            text_matches.append((prop_filter.get("name", "").upper(), text_match.text if text_match is not None else None, is_not_defined))
+
+        responses = []
+        for href, resource in calendar.resources.items():
+            if range_start is not None and resource.end is not None and resource.end < range_start:
+                continue
+            if range_end is not None and resource.start is not None and resource.start > range_end:
+                continue
+            if not all(self._matches(resource, *text_match) for text_match in text_matches):
+                continue
+            responses.append(self._response(href, *self._resource_props(resource, requested)))
+        return self._multistatus(responses)
+
+    @staticmethod
+    def _matches(resource: MockResource, name: str, text: str | None, is_not_defined: bool) -> bool:
+        value = resource.properties.get(name)
+        if is_not_defined:
+            return value is None
+        if value is None:
+            return False
+        return text is None or text.lower() in value.lower()
+
+    def _multiget(self, calendar: MockCalendar, root: ElementTree.Element):
+        requested = self._requested_props(root)
+        responses = []
+        for href_element in root.iter(f"{{{DAV}}}href"):
+            href = unquote(urlparse(href_element.text or "").path)
+            resource = calendar.resources.get(href)
+            if resource is None:
+                responses.append(self._status_response(href, "404 Not Found"))
+            else:
+                responses.append(self._response(href, *self._resource_props(resource, requested)))
+        return self._multistatus(responses)
+
+    def _sync_collection(self, calendar: MockCalendar, root: ElementTree.Element):
+        requested = self._requested_props(root) or [f"{{{DAV}}}getetag"]
+        token_element = root.find(f"{{{DAV}}}sync-token")
+        token = (token_element.text or "").strip() if token_element is not None else ""
+
+        since = 0
+        if token:
+            if not token.startswith(SYNC_TOKEN_PREFIX) or not token[len(SYNC_TOKEN_PREFIX) :].isdigit():
+                payload = '<?xml version="1.0" encoding="utf-8"?>\n<D:error xmlns:D="DAV:"><D:valid-sync-token/></D:error>'
+                return 403, {"Content-Type": 'application/xml; charset="utf-8"'}, payload.encode("utf-8")
+            since = int(token[len(SYNC_TOKEN_PREFIX) :])
+
+        responses = [
+            self._response(href, *self._resource_props(resource, requested)) for href, resource in calendar.resources.items() if resource.version > since
+        ]
+        if since:
+            responses += [self._status_response(href, "404 Not Found") for href, version in calendar.deleted.items() if version > since]
+        return self._multistatus(responses, f"<D:sync-token>{escape(calendar.sync_token)}</D:sync-token>")
+
+    def _get(self, path, body):
+        _, resource = self._resource(path)
+        if resource is None:
+            return 404, {}, b""
+        return 200, {"Content-Type": "text/calendar; charset=utf-8", "ETag": resource.etag}, resource.data.encode("utf-8")
+
+    def _put(self, path, body):
+        calendar, resource = self._resource(path)
+        if calendar is None:
+            return 409, {}, b""
+        if self.headers.get("If-None-Match") == "*" and resource is not None:
+            return 412, {}, b""
+        if_match = self.headers.get("If-Match")
+        if if_match is not None and (resource is None or resource.etag != if_match):
+            return 412, {}, b""
+        stored = calendar.put(path, body.decode("utf-8"))
+        return (204 if resource is not None else 201), {"ETag": stored.etag}, b""
+
+    def _delete(self, path, body):
+        calendar, resource = self._resource(path)
+        if resource is None:
+            return 404, {}, b""
+        calendar.delete(path)
+        return 204, {}, b""
+
+
+def start_server(
+    source_events: int = 0,
+    source_name: str = "Source",
+    target_name: str = "Target",
+    **options,
+) -> MockCalDAVServer:
+    """server with a source calendar of fixture events and an empty target calendar"""
+    from benchmarks.fixtures import FixtureCalendar
+
+    server = MockCalDAVServer(**options)
+    server.add_calendar(source_name, FixtureCalendar(source_name).resources(source_events))
+    server.add_calendar(target_name)
+    return server.start()
+
+
+if __name__ == "__main__":
+    # serve interactively: python -m benchmarks.caldav_server
+    with start_server(source_events=100, latency=0.02, jitter=0.01) as mock_server:
+        print(f"Mock CalDAV server running on {mock_server.url} (calendars: Source, Target). Press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
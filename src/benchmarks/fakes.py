@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""
+in-memory stand-ins for the target calendar
+"""
+
+# python lib
+import threading
+import uuid
+
+# external libs
+from caldav.lib.url import URL
+import caldav
+
+
+class FakeResource(caldav.Event):
+    """calendar object that is kept by its FakeCalendar instead of being sent to a server"""
+
+    def save(self, *args, **kwargs):
+        self.parent.store(self)
+        return self
+
+    def delete(self):
+        self.parent.remove(self)
+
+
+class FakeCalendar:
+    """target collection in memory. supports the calls chronos makes on the target calendar while syncing"""
+
+    def __init__(self, url: str = "http://chronos.invalid/target/"):
+        self.url = URL.objectify(url)
+        self.client = None
+        self.resources: dict[str, str] = {}
+        self.writes = {"create": 0, "update": 0, "delete": 0}
+        self._lock = threading.Lock()
+
+    def add_event(self, ical, no_overwrite: bool = False, no_create: bool = False) -> FakeResource:
+        resource = FakeResource(client=None, url=self.url.join(f"{uuid.uuid4()}.ics"), data=ical, parent=self)
+        return resource.save()
+
+    def store(self, resource: FakeResource) -> None:
+        href = str(resource.url)
+        with self._lock:
+            self.writes["update" if href in self.resources else "create"] += 1
+            self.resources[href] = resource.data
+
+    def remove(self, resource: FakeResource) -> None:
+        with self._lock:
+            self.writes["delete"] += 1
+            self.resources.pop(str(resource.url), None)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""
+synthetic ICS calendars built from the events of the testdata fixtures
+"""
+
+# python lib
+import datetime as dt
+
+# own code
+from benchmarks.sanitizer import HTML_DESCRIPTIONS, TESTDATA
+from chronos.ics_reader import IcsStream, event_header
+
+
+CONTENT_PROPERTIES = ("SUMMARY", "DESCRIPTION", "LOCATION", "CATEGORIES", "STATUS", "CLASS")
+TIMEZONE_FIXTURE = "testevents-2026-november.ics"
+
+ICS_DATE = "%Y%m%d"
+ICS_DATETIME = "%Y%m%dT%H%M%S"
+ICS_UTC = "%Y%m%dT%H%M%SZ"
+
+
+def escape_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def fold(line: str) -> list[str]:
+    """fold a content line at 75 characters (RFC 5545, 3.1)"""
+    lines = [line[:75]]
+    for position in range(75, len(line), 74):
+        lines.append(" " + line[position : position + 74])
+    return lines
+
+
+class FixtureCalendar:
+    """
+    generates calendars of any size from the fixture events.
+    every tenth event is all-day, multi-day, recurring or has an HTML description, one in twenty lies in the past
+    """
+
+    def __init__(self, cal_name: str, range_max: int = 365):
+        self.cal_name = cal_name
+        self.range_max = range_max
+        self.templates = self._read_templates()
+        with open(TESTDATA / TIMEZONE_FIXTURE, encoding="utf-8") as file:
+            stream = IcsStream(file)
+            for _ in stream.events():
+                pass
+        self.timezone = stream.timezones[0]
+
+    @staticmethod
+    def _read_templates() -> list[dict[str, str]]:
+        templates = []
+        for filename in sorted(TESTDATA.glob("*.ics")):
+            with open(filename, encoding="utf-8") as file:
+                for block in IcsStream(file).events():
+                    header = event_header(block)
+                    templates.append({name: header[name] for name in CONTENT_PROPERTIES if name in header})
+        return templates
+
+    def event_lines(self, index: int, today: dt.date, last_modified: dt.datetime, changed: bool = False) -> list[str]:
+        template = self.templates[index % len(self.templates)]
+        kind = index % 10
+
+        offset = 1 + (index * 7) % max(self.range_max - 10, 1)
+        if index % 20 == 19:
+            offset = -30
+        day = today + dt.timedelta(days=offset)
+
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:benchmark-{index}@chronos",
+            f"DTSTAMP:{last_modified.strftime(ICS_UTC)}",
+            f"LAST-MODIFIED:{last_modified.strftime(ICS_UTC)}",
+        ]
+        if kind == 0:
+            lines.append(f"DTSTART;VALUE=DATE:{day.strftime(ICS_DATE)}")
+            lines.append(f"DTEND;VALUE=DATE:{(day + dt.timedelta(days=1)).strftime(ICS_DATE)}")
+        elif kind == 1:
+            lines.append(f"DTSTART;VALUE=DATE:{day.strftime(ICS_DATE)}")
+            lines.append(f"DTEND;VALUE=DATE:{(day + dt.timedelta(days=3)).strftime(ICS_DATE)}")
+        else:
+            start = dt.datetime.combine(day, dt.time(19, 0))
+            lines.append(f"DTSTART;TZID=Europe/Berlin:{start.strftime(ICS_DATETIME)}")
+            lines.append(f"DTEND;TZID=Europe/Berlin:{(start + dt.timedelta(hours=3)).strftime(ICS_DATETIME)}")
+        if kind == 2:
+            lines.append("RRULE:FREQ=WEEKLY;COUNT=4")
+
+        content = dict(template)
+        content.setdefault("SUMMARY", "Event")
+        content["SUMMARY"] = f"{content['SUMMARY']} {index}" + (" (changed)" if changed else "")
+        if kind == 3:
+            content["DESCRIPTION"] = escape_text(HTML_DESCRIPTIONS[index % len(HTML_DESCRIPTIONS)])
+
+        for name, value in content.items():
+            lines += fold(f"{name}:{value}")
+        lines.append("END:VEVENT")
+        return lines
+
+    def header_lines(self) -> list[str]:
+        return [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//Chronos//Benchmark//EN",
+            f"X-WR-CALNAME:{self.cal_name}",
+            *self.timezone,
+        ]
+
+    def resources(self, size: int) -> list[str]:
+        """one iCal object per event as stored on a CalDAV server"""
+        today = dt.date.today()
+        last_modified = dt.datetime.now(dt.timezone.utc).replace(microsecond=0) - dt.timedelta(days=1)
+        header = self.header_lines()
+        return ["\r\n".join(header + self.event_lines(index, today, last_modified) + ["END:VCALENDAR"]) + "\r\n" for index in range(size)]
+
+    def render(self, size: int, changed_every: int = 0) -> str:
+        """
+        ICS file with the given number of events.
+        with changed_every every n-th event gets a new title and a later modification date
+        """
+        today = dt.date.today()
+        now = dt.datetime.now(dt.timezone.utc).replace(microsecond=0)
+        lines = self.header_lines()
+        for index in range(size):
+            changed = changed_every > 0 and index % changed_every == 0
+            last_modified = now + dt.timedelta(days=1) if changed else now - dt.timedelta(days=1)
+            lines += self.event_lines(index, today, last_modified, changed)
+        lines.append("END:VCALENDAR")
+        return "\r\n".join(lines) + "\r\n"
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+"""
+microbenchmark of the description sanitizer against the BeautifulSoup pipeline it replaced.
+checks both return the same for the descriptions of the testdata ICS files and some HTML descriptions
+
+run from src: python -m benchmarks.sanitizer
+"""
+
+# python lib
+from html.parser import HTMLParser
+from pathlib import Path
+import argparse
+import timeit
+
+# external libs
+from bs4 import BeautifulSoup
+import icalendar
+
+# own code
+from chronos import helpers
+
+
+TESTDATA = Path(__file__).resolve().parent.parent / "testdata"
+
+HTML_DESCRIPTIONS = [
+    "<p>Einlass 19 Uhr</p><p>Eintritt frei</p>",
+    'Tickets unter <a href="https://example.org/tickets">example.org/tickets</a><br>Abendkasse &amp; VVK',
+    '<p>Line 1<br/>Line 2</p><p><a href="https://example.org">https://example.org</a></p>#internal note\\n',
+    "<b>Bold</b> and <i>italic</i> text<br><br><br>with too many breaks",
+    "a <br /> b",
+    "&lt;b&gt;",
+    "<p>Preis</p>&lt;10 &euro;",
+]
+
+# intended differences to the legacy pipeline: description -> output of helpers.sanitize_description
+# the legacy pipeline only replaced "<br>" and "<br/>" and parsed unescaped text a second time
+CHANGED_OUTPUT = {
+    "a <br /> b": "a \\n b",
+    "&lt;b&gt;": "<b>",
+}
+
+
+class HTMLFilter(HTMLParser):
+    """
+    small helper class to eliminate HTML tags from a text.
+    thanks, https://stackoverflow.com/a/55825140
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.text = ""
+
+    def handle_data(self, data):
+        self.text += data
+
+
+def sanitize_link_with_line_breaks(text_input: str) -> str:
+    # handle links with BeautifulSoup
+    soup = BeautifulSoup(text_input, "html.parser")
+
+    for data in soup(["a"]):
+        anchor_url = data.get("href")
+        if anchor_url is None:
+            continue
+
+        anchor_text = data.string
+        if anchor_text is None:
+            continue
+
+        replacement_text = anchor_url
+        amount_line_breaks = anchor_text.count("\\n")
+        sanitized_anchor_text = anchor_text.replace("\\n", "")
+        if anchor_url != sanitized_anchor_text:
+            replacement_text = f"{sanitized_anchor_text} ({anchor_url})"
+
+        replacement_text += " " + "\\n" * amount_line_breaks
+
+        data.string = str(replacement_text)
+
+    text_without_links = "".join(soup.stripped_strings)
+    return text_without_links
+
+
+def remove_html_from_description(text_input: str) -> str:
+    """remove replace HTML line breaks and remove HTML tags"""
+    # handle single line breaks
+    text = text_input.replace("<br>", "\\n")
+    text = text.replace("<br/>", "\\n")
+
+    # handle paragraph (the HTMLFilter will take care of the <p> tag)
+    text = text.replace("</p>", "\\n</p>")
+
+    text_without_links = sanitize_link_with_line_breaks(text)
+
+    # strip other tags
+    f = HTMLFilter()
+    f.feed(text_without_links)
+
+    result = f.text
+    return result
+
+
+def legacy_sanitize(text: str) -> str:
+    """sanitizer pipeline before the precompiled single pass version"""
+    text = remove_html_from_description(text)
+    text = helpers.remove_multi_line_comments(text)
+    text = helpers.remove_single_line_comments(text)
+    return helpers.strip_newlines(text)
+
+
+def testdata_descriptions() -> list[str]:
+    descriptions = []
+    for filename in sorted(TESTDATA.glob("*.ics")):
+        calendar = icalendar.Calendar.from_ical(filename.read_bytes())
+        for component in calendar.walk("VEVENT"):
+            description = component.get("description")
+            if description is not None:
+                descriptions.append(description.to_ical().decode("utf-8"))
+    return descriptions
+
+
+def measure(function, descriptions: list[str], repeat: int) -> float:
+    """best time in ms of sanitizing all descriptions once"""
+    timer = timeit.Timer(lambda: [function(text) for text in descriptions])
+    return min(timer.repeat(repeat=repeat, number=1)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    descriptions = testdata_descriptions()
+    html_descriptions = HTML_DESCRIPTIONS
+    print(f"{len(descriptions)} testdata descriptions, {len(html_descriptions)} HTML descriptions")
+
+    mismatches = []
+    for text in descriptions + html_descriptions:
+        expected = CHANGED_OUTPUT[text] if text in CHANGED_OUTPUT else legacy_sanitize(text)
+        if helpers.sanitize_description(text) != expected:
+            mismatches.append(text)
+            print(f"MISMATCH: {text!r}")
+
+    uncached = helpers.sanitize_description.__wrapped__
+    for label, texts in (("testdata", descriptions), ("html", html_descriptions)):
+        legacy = measure(legacy_sanitize, texts, args.repeat)
+        single_pass = measure(uncached, texts, args.repeat)
+        helpers.sanitize_description.cache_clear()
+        helpers.sanitize_description(texts[0])
+        cached = measure(helpers.sanitize_description, texts, args.repeat)
+        print(
+            f"{label:>8}: legacy {legacy:8.3f}ms | single pass {single_pass:8.3f}ms ({legacy / single_pass:5.1f}x)"
+            f" | cached {cached:8.3f}ms ({legacy / cached:5.1f}x)"
+        )
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
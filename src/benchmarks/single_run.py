@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+end to end throughput of AppFactory.single_run against the mock CalDAV server
+
+run from src: python -m benchmarks.single_run --events 1000 --latency 0.05 --jitter 0.02 --error-rate 0.01
+"""
+
+# python lib
+from pathlib import Path
+import argparse
+import datetime as dt
+import json
+import logging
+import platform
+import random
+import tempfile
+import time
+
+# external libs
+import regex
+
+# own code
+from benchmarks.caldav_server import MockCalDAVServer, start_server
+from benchmarks.suite import BENCHMARK_DIR, SOURCE_CONFIG, create_config, git_revision
+from chronos import logging_helpers
+from chronos.app_factory import AppFactory
+
+
+def write_calendars_config(workdir: Path, server: MockCalDAVServer) -> None:
+    credentials = {"cal_primary": server.url, "cal_user": server.user, "cal_passwd": "benchmark"}
+    calendars = {
+        "calendars": [{**SOURCE_CONFIG, **credentials, "cal_name": "Source"}],
+        "target": {**credentials, "cal_name": "Target"},
+        "icons": {"Band": "\N{GUITAR}", "DJ": "\N{HEADPHONE}"},
+    }
+    (workdir / "calendars.json").write_text(json.dumps(calendars), encoding="utf-8")
+
+
+def change_events(server: MockCalDAVServer, amount: int, rng: random.Random, run: int) -> None:
+    """give some source events a new title and modification date like an editor would"""
+    calendar = server.calendar_by_name("Source")
+    stamp = (dt.datetime.now(dt.timezone.utc) + dt.timedelta(minutes=run)).strftime("%Y%m%dT%H%M%SZ")
+    with server.lock:
+        hrefs = rng.sample(list(calendar.resources), min(amount, len(calendar.resources)))
+        for href in hrefs:
+            data = calendar.resources[href].data
+            data = regex.sub(r"LAST-MODIFIED:\S+", f"LAST-MODIFIED:{stamp}", data)
+            data = regex.sub(r"(SUMMARY:[^\r\n]*)", rf"\1 ({run})", data, count=1)
+            calendar.put(href, data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=1000, help="events in the source calendar")
+    parser.add_argument("--runs", type=int, default=5, help="runs after the initial one")
+    parser.add_argument("--changes", type=int, default=10, help="source events changed before every following run")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="mean of exponentially distributed extra delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--read-workers", type=int, default=4)
+    parser.add_argument("--write-workers", type=int, default=8)
+    parser.add_argument("--output", type=Path, help="JSON result file. default: benchmarks/results/single_run-<timestamp>.json")
+    args = parser.parse_args()
+
+    started = dt.datetime.now()
+    rng = random.Random(args.seed)
+    runs = []
+
+    server_options = {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate, "seed": args.seed}
+    with tempfile.TemporaryDirectory(prefix="chronos-benchmark-") as tmp, start_server(source_events=args.events, **server_options) as server:
+        workdir = Path(tmp)
+        write_calendars_config(workdir, server)
+        app_config = create_config(
+            workdir,
+            app={"read_workers": args.read_workers, "write_workers": args.write_workers},
+            calendars={"persist_state": True},
+        )
+        logging_helpers.init_logging(app_config)
+        # request logs of the clients would dominate the measurement
+        for name in ("", "chronos"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        factory = AppFactory(app_config)
+        factory.create()
+
+        for run in range(args.runs + 1):
+            if run > 0 and args.changes:
+                change_events(server, args.changes, rng, run)
+
+            server.log.clear()
+            start = time.perf_counter()
+            factory.single_run()
+            duration = time.perf_counter() - start
+
+            stats = server.log.summary()
+            target_events = len(server.calendar_by_name("Target").resources)
+            runs.append({"run": run, "duration": duration, "target_events": target_events, "http": stats})
+            print(
+                f"run {run}: {duration:7.2f}s | {stats['requests']:>6} requests | {stats['errors']:>4} errors"
+                f" | p95 {stats['latency'].get('p95', 0) * 1000:7.1f}ms | {target_events} target events"
+            )
+
+        factory.stop()
+
+    report = {
+        "benchmark": "single_run",
+        "started": started.isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": vars(args) | {"output": None},
+        "runs": runs,
+    }
+
+    output = args.output or BENCHMARK_DIR / "results" / f"single_run-{started:%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmark of the sync stages on synthetic calendars built from the testdata fixtures
+
+run from src: python -m benchmarks.suite --sizes 100,1000,10000
+"""
+
+# python lib
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+import argparse
+import datetime as dt
+import json
+import logging
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# external libs
+import icalendar
+
+# own code
+from benchmarks.fakes import FakeCalendar
+from benchmarks.fixtures import FixtureCalendar
+from chronos import helpers
+from chronos.app_factory import AppFactory
+from chronos.calendar_handler import CalendarHandler
+from chronos.chronos_event import ChronosEvent
+from chronos.config import Config
+from chronos.ics_reader import IcsStream, parse_event
+
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+DEFAULT_SIZES = (100, 1000, 10000)
+
+APP_CONFIG = """
+[app]
+timezone = Europe/Berlin
+app_id = Chronos
+{app}
+
+[calendars]
+path = {path}
+{calendars}
+
+[log]
+path = {path}
+"""
+
+SOURCE_CONFIG = {
+    "cal_name": "Benchmark",
+    "title_prefix": "BD",
+    "tags": ["BD", "ILSC"],
+    "tags_excluded": ["Intern"],
+    "ignore_planned": True,
+    "force_time": True,
+    "force_start": "20:00",
+    "force_end": "23:59",
+    "default_location": "BD Club",
+    "color": "lightskyblue",
+}
+
+TARGET_CONFIG = {
+    "cal_name": "Target",
+    "cal_primary": "http://chronos.invalid/target/",
+}
+
+
+def create_config(workdir: Path, app: dict | None = None, calendars: dict | None = None) -> Config:
+    """app config with defaults and state persistence disabled. app and calendars override options of these sections"""
+    filename = workdir / "app.cfg"
+    options = {
+        section: "\n".join(f"{key} = {value}" for key, value in (values or {}).items())
+        for section, values in (("app", app), ("calendars", {"persist_state": False, **(calendars or {})}))
+    }
+    filename.write_text(APP_CONFIG.format(path=workdir, **options), encoding="utf-8")
+    with mock.patch.object(sys, "argv", ["benchmark", "-c", str(filename)]):
+        return Config()
+
+
+def git_revision() -> str | None:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR, capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception:
+        return None
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        yield
+        self.stages[name] = time.perf_counter() - start
+
+
+class SyncBenchmark:
+    """runs every stage of a sync for one calendar size"""
+
+    def __init__(self, app_config: Config, workdir: Path, size: int, changed_every: int):
+        self.app_config = app_config
+        self.size = size
+
+        fixtures = FixtureCalendar(SOURCE_CONFIG["cal_name"], app_config.get("calendars", "range_max"))
+        self.ics_file = workdir / f"benchmark-{size}.ics"
+        self.contents = fixtures.render(size)
+        # same file with modified events. the url must not change as it is part of the calendar id
+        self.changed_contents = fixtures.render(size, changed_every)
+        self.counts: dict[str, int] = {"events_in_file": size}
+
+    def _create_factory(self) -> AppFactory:
+        factory = AppFactory(self.app_config)
+
+        factory.target = CalendarHandler(self.app_config)
+        factory.target.config(TARGET_CONFIG)
+        factory.target.calendar = FakeCalendar(TARGET_CONFIG["cal_primary"])
+
+        source = CalendarHandler(self.app_config)
+        source.config({**SOURCE_CONFIG, "cal_primary": self.ics_file.as_uri()})
+        source.parse_pool = factory.parse_pool
+        factory.calendars = [source]
+        return factory
+
+    def _sync(self, factory: AppFactory, source: CalendarHandler, label: str) -> None:
+        changed, deleted, new = factory.sync_calendar(source)
+        self.counts[f"{label}_updated"] = len(changed)
+        self.counts[f"{label}_deleted"] = len(deleted)
+        self.counts[f"{label}_created"] = len(new)
+
+    def run(self) -> dict[str, float]:
+        helpers.sanitize_description.cache_clear()
+        self.ics_file.write_text(self.contents, encoding="utf-8", newline="")
+        timer = StageTimer()
+        factory = self._create_factory()
+        source = factory.calendars[0]
+
+        with timer.stage("read_ics"):
+            source.read()
+        self.counts["events_read"] = len(source.events_data)
+
+        with timer.stage("parse"):
+            with open(self.ics_file, encoding="utf-8") as file:
+                stream = IcsStream(file)
+                components = [parse_event(block) for block in stream.events()]
+
+        with timer.stage("populate"):
+            events = []
+            for component in components:
+                event = ChronosEvent(source)
+                event._ics_event = component
+                event.populate_from_vcal_object()
+                events.append(event)
+
+        with timer.stage("filter"):
+            visible = [
+                event
+                for event in source.events_data.values()
+                if event.has_title and not event.is_canceled and not event.is_hidden and not event.date_out_of_range
+            ]
+        self.counts["events_visible"] = len(visible)
+
+        with timer.stage("render"):
+            for event in visible:
+                calendar = icalendar.Calendar()
+                calendar.add_component(event.create_ical_event())
+                calendar.to_ical()
+
+        with timer.stage("sync_initial"):
+            self._sync(factory, source, "sync_initial")
+
+        with timer.stage("sync_unchanged"):
+            self._sync(factory, source, "sync_unchanged")
+
+        self.ics_file.write_text(self.changed_contents, encoding="utf-8", newline="")
+        with timer.stage("read_ics_changed"):
+            source.read()
+
+        with timer.stage("sync_changed"):
+            self._sync(factory, source, "sync_changed")
+
+        factory.stop()
+        return timer.stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma separated event counts, e.g. 100,1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size. the best time of every stage is reported")
+    parser.add_argument("--changed-every", type=int, default=10, help="every n-th event is modified for the sync_changed stage")
+    parser.add_argument("--parse-processes", type=int, default=0, help="worker processes parsing the ICS file ([calendars] parse_processes)")
+    parser.add_argument("--output", type=Path, help="JSON result file. default: benchmarks/results/suite-<timestamp>.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("chronos").setLevel(logging.WARNING)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    started = dt.datetime.now()
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="chronos-benchmark-") as tmp:
+        workdir = Path(tmp)
+        app_config = create_config(workdir, calendars={"parse_processes": args.parse_processes})
+
+        for size in sizes:
+            benchmark = SyncBenchmark(app_config, workdir, size, args.changed_every)
+            runs = [benchmark.run() for _ in range(max(1, args.repeat))]
+            stages = {name: min(run[name] for run in runs) for name in runs[0]}
+            results.append({"size": size, "counts": benchmark.counts, "stages": stages})
+
+            summary = " | ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in stages.items())
+            print(f"{size:>7} events: {summary}")
+
+    report = {
+        "benchmark": "suite",
+        "started": started.isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "parse_processes": args.parse_processes,
+        "results": results,
+    }
+
+    output = args.output or BENCHMARK_DIR / "results" / f"suite-{started:%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,9 @@
 from chronos.app import main
 
 
-try:
-    main()
-except Exception as ex:
-    print(ex)
+# guarded, as spawned worker processes import the main module
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        print(ex)
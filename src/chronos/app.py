@@ -6,6 +6,7 @@ Created on 24.02.2022
 @author: input
 """
 
+import json
 import logging
 
 from chronos import helpers
@@ -28,6 +29,12 @@ def main():
     try:
         factory = AppFactory(app_config)
         factory.create()
+        if app_config.appCL.dry_run:
+            plan = factory.dry_run()
+            if app_config.appCL.plan_file is None:
+                print(json.dumps(plan.to_dict(), indent=2, ensure_ascii=False))
+            factory.stop()
+            return
         factory.init_schedulers()
         factory.run()
     except Exception as ex:
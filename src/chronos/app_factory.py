@@ -7,11 +7,14 @@ Created on 25.02.2022
 """
 
 # python lib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
 import datetime as dt
 import json
 import logging
+import multiprocessing
 import time
-import zoneinfo
 
 # external libs
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -21,6 +24,13 @@ import icalendar
 from chronos.config import Config
 from chronos.calendar_handler import CalendarHandler
 from chronos.chronos_event import ChronosEvent
+from chronos.dav_session import SessionRegistry
+from chronos.metrics import RunMetrics
+from chronos.run_context import RunContext
+from chronos.run_coordinator import PollSchedule, RunCoordinator
+from chronos.state_store import StateStore
+from chronos.sync_plan import ACTIONS, CalendarPlan, PlannedWrite, SyncPlan
+from chronos.webhook import WebhookListener
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +44,31 @@ class AppFactory:
         self.calendars: list[CalendarHandler] = []
         self.target: CalendarHandler
 
+        self.sessions = SessionRegistry(
+            self.app_config.get("app", "connection_ttl"),
+            self.app_config.get("app", "request_timeout"),
+            self.app_config.get("app", "write_workers"),
+        )
+
+        self.state: StateStore | None = None
+        if self.app_config.get("calendars", "persist_state"):
+            self.state = StateStore(self.app_config.get("calendars", "state_file"))
+
+        self.metrics = RunMetrics()
+
+        # spawned workers don't inherit locks held by the scheduler or read threads
+        self.parse_pool: ProcessPoolExecutor | None = None
+        parse_processes = self.app_config.get("calendars", "parse_processes")
+        if parse_processes > 1:
+            self.parse_pool = ProcessPoolExecutor(max_workers=parse_processes, mp_context=multiprocessing.get_context("spawn"))
+
+        # runs never overlap. the scheduler, the startup run and other triggers request runs from the coordinator
+        self.coordinator = RunCoordinator(self.single_run)
+        self.poll_schedule: PollSchedule | None = None
+        if self.app_config.get("app", "adaptive_polling"):
+            self.poll_schedule = PollSchedule(self.app_config.get("app", "poll_interval_max"))
+        self.webhook: WebhookListener | None = None
+
         self.active = False
 
     def create(self) -> None:
@@ -53,20 +88,61 @@ class AppFactory:
         target_data["icons"] = icons
         self.target = CalendarHandler(self.app_config)
         self.target.config(target_data)
+        self.target.chronos_only = True
+        self.target.sessions = self.sessions
+        self.target.state = self.state
+        self.target.load_state()
 
         for cal in calendars_data:
             cal["icons"] = icons
             _calendar = CalendarHandler(self.app_config)
             _calendar.config(cal)
+            _calendar.sessions = self.sessions
+            _calendar.parse_pool = self.parse_pool
+            _calendar.state = self.state
+            _calendar.load_state()
             self.calendars.append(_calendar)
 
-    def read_calendars(self) -> None:
-        self.target.read()
-        for calendar in self.calendars:
-            calendar.read()
+    def select_calendars(self, calendar_ids: set[str] | None = None) -> list[CalendarHandler]:
+        """source calendars by chronos id. None selects all"""
+        if calendar_ids is None:
+            return self.calendars
+        return [calendar for calendar in self.calendars if calendar.chronos_id in calendar_ids]
+
+    def read_calendars(self, calendars: list[CalendarHandler] | None = None) -> None:
+        """read target and source calendars in parallel. failing sources are skipped for this run"""
+        handlers = [self.target, *(self.calendars if calendars is None else calendars)]
+        max_workers = max(1, self.app_config.get("app", "read_workers"))
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chronos-read") as executor:
+            futures = {executor.submit(self._read_calendar, handler): handler for handler in handlers}
+            for future in as_completed(futures):
+                handler = futures[future]
+                try:
+                    future.result()
+                    handler.read_failed = False
+                except Exception as ex:
+                    handler.read_failed = True
+                    self.metrics.set_value(handler.cal_name, "read_failed", True)
+                    show_trace = self.app_config.get("log", "show_tracebacks")
+                    logger.error(f'Could not read calendar "{handler.cal_name}". Reason: {ex}', exc_info=show_trace)
 
-    def sanitize_events(self) -> None:
-        for calendar in self.calendars:
+        if self.target.read_failed:
+            raise ValueError(f'read_calendars: target calendar "{self.target.cal_name}" could not be read')
+
+    def _read_calendar(self, handler: CalendarHandler) -> None:
+        start = time.perf_counter()
+        try:
+            handler.read()
+        finally:
+            self.metrics.set_value(handler.cal_name, "read_seconds", time.perf_counter() - start)
+        self.metrics.set_value(handler.cal_name, "events_kept", len(handler.events_data))
+
+    def sanitize_events(self, calendars: list[CalendarHandler] | None = None, dry_run: bool = False) -> None:
+        """update states and icons of source events. on a dry run the changes are only applied in memory"""
+        for calendar in self.calendars if calendars is None else calendars:
+            if calendar.read_failed:
+                continue
             if not calendar.sanitize_stati and not calendar.sanitize_icons_src:
                 continue
 
@@ -82,155 +158,376 @@ class AppFactory:
                     was_title_change_succesful = event.set_title_icons()
                     do_save = do_save or was_title_change_succesful
 
-                if do_save:
+                if do_save and dry_run:
+                    logger.debug(f"Would update source event: {event.date} | {event.safe_title}")
+                elif do_save:
                     event.save()
+                    self.metrics.count(calendar.cal_name, "sanitize_writes")
                     logger.debug(f"Updated source event: {event.date} | {event.safe_title}")
 
     def init_schedulers(self) -> None:
         # appcron_value = f"*/{self.app_config.get('app', 'appcron')}"
         # self.scheduler.add_job(self.single_run, "cron", id="smallfish", hour=appcron_value, minute=0)
 
+        # a tick missed while a run is active is dropped instead of being queued up
         datacron_value = str(self.app_config.get("app", "datacron"))
-        self.scheduler.add_job(self.single_run, "cron", id="catfish", minute=datacron_value)
+        self.scheduler.add_job(self.scheduled_run, "cron", id="catfish", minute=datacron_value, coalesce=True, max_instances=1)
+
+        # calendars with their own poll_interval only sync themselves
+        for calendar in self.calendars:
+            if not calendar.poll_interval:
+                continue
+            self.scheduler.add_job(
+                partial(self.coordinator.request, {calendar.chronos_id}),
+                "interval",
+                id=f"calendar-{calendar.chronos_id}",
+                name=f"poll {calendar.cal_name}",
+                seconds=calendar.poll_interval,
+                coalesce=True,
+                max_instances=1,
+            )
+            logger.debug(f'Polling "{calendar.cal_name}" every {calendar.poll_interval} seconds')
 
         self.scheduler.start()
         pass
 
+    def scheduled_run(self) -> None:
+        """run for the datacron calendars due according to the poll schedule"""
+        calendar_ids = {calendar.chronos_id for calendar in self.calendars if not calendar.poll_interval}
+        if self.poll_schedule is not None:
+            calendar_ids = self.poll_schedule.due(calendar_ids)
+        if not calendar_ids:
+            logger.debug("No calendar due for polling")
+            return
+        self.coordinator.request(calendar_ids)
+
+    def init_webhook(self) -> None:
+        """listen for change notifications if [webhook] is enabled"""
+        if not self.app_config.get("webhook", "enabled"):
+            return
+        self.webhook = WebhookListener(
+            self.app_config.get("webhook", "host"),
+            self.app_config.get("webhook", "port"),
+            self.app_config.get("webhook", "token"),
+            self.app_config.get("webhook", "debounce"),
+            self.find_calendar_id,
+            self.coordinator.request,
+        )
+        self.webhook.start()
+
+    def find_calendar_id(self, reference: str) -> str | None:
+        """chronos id of the source calendar referenced by chronos id, name or the last segment of its collection url"""
+        for calendar in self.calendars:
+            collection = (calendar.calendar_url or "").rstrip("/").rsplit("/", 1)[-1]
+            if reference in (calendar.chronos_id, calendar.cal_name) or (collection and reference == collection):
+                return calendar.chronos_id
+        return None
+
     def run(self) -> None:
         self.active = True
-        self.single_run()
+        self.init_webhook()
+        self.coordinator.request()
         while self.active:
             time.sleep(60)
 
     def stop(self) -> None:
         self.active = False
-
-    def single_run(self) -> None:
+        if self.webhook is not None:
+            self.webhook.stop()
+        self.sessions.close()
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown(cancel_futures=True)
+        if self.state is not None:
+            self.state.close()
+
+    def single_run(self, calendar_ids: set[str] | None = None) -> None:
+        """sync the given source calendars (None for all). use coordinator.request to avoid overlapping runs"""
+        calendars = self.select_calendars(calendar_ids)
+        self._start_run()
         try:
-            self.read_calendars()
+            with self.metrics.stage("read"):
+                self.read_calendars(calendars)
             logger.debug("Done parsing source calendars")
-            self.sanitize_events()
+            with self.metrics.stage("sanitize"):
+                self.sanitize_events(calendars)
             logger.debug("Cleaning up")
-            self.sync_calendars()
+            with self.metrics.stage("plan"):
+                plan = self.plan_sync(calendars)
+            self.write_plan(plan)
+            with self.metrics.stage("sync"):
+                self.apply_plan(plan)
             logger.debug("--== All done for this run ==--")
-            self.close_calendars()
-            logger.debug("Closed sockets to calendars")
+            with self.metrics.stage("close"):
+                self.close_calendars()
+            logger.debug("Released connections to calendars")
         except Exception as ex:
             show_trace = self.app_config.get("log", "show_tracebacks")
             logger.critical(f"Cron excecution failed. Reason {ex}", exc_info=show_trace)
+        finally:
+            self._write_metrics()
+
+    def dry_run(self, calendar_ids: set[str] | None = None) -> SyncPlan:
+        """read calendars and plan the sync without writing to any calendar"""
+        calendars = self.select_calendars(calendar_ids)
+        self._start_run()
+        try:
+            with self.metrics.stage("read"):
+                self.read_calendars(calendars)
+            with self.metrics.stage("sanitize"):
+                self.sanitize_events(calendars, dry_run=True)
+            with self.metrics.stage("plan"):
+                plan = self.plan_sync(calendars)
+            self.write_plan(plan)
+            logger.success(f"Dry run planned {plan.summary()}")
+            return plan
+        finally:
+            self.close_calendars()
+
+    def _start_run(self) -> None:
+        """collect metrics and compute range limits of the next run"""
+        self.metrics = RunMetrics()
+        self.sessions.metrics = self.metrics
+        run_context = RunContext(self.app_config)
+        for handler in [self.target, *self.calendars]:
+            handler.metrics = self.metrics
+            handler.run_context = run_context
+
+    def _write_metrics(self) -> None:
+        self.metrics.finish()
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.metrics.stages.items())
+        logger.debug(f"Run took {self.metrics.duration:.2f}s ({stages}). {self.metrics.http['requests']} HTTP requests")
+
+        if not self.app_config.get("metrics", "enabled"):
+            return
+        try:
+            self.metrics.write(self.app_config.get("metrics", "json_file"), self.app_config.get("metrics", "prometheus_file"))
+        except Exception as ex:
+            logger.error(f"Could not write metrics. Reason: {ex}")
 
     def close_calendars(self):
+        """release connections. sessions are kept for the next run until they expire"""
         try:
             self.target.close_connection()
             for calendar in self.calendars:
                 calendar.close_connection()
+            self.sessions.expire()
         except Exception as ex:
             logger.critical(f"Closing sockets failed. Reason: {ex}")
 
-    def sync_calendars(self) -> None:
-        app_timezone = zoneinfo.ZoneInfo(self.app_config.get("app", "timezone"))
-        for calendar in self.calendars:
-            changed, deleted, new = self.sync_calendar(calendar)
-            calendar.last_check = dt.datetime.now().astimezone(app_timezone)
+    def sync_calendar(self, calendar: CalendarHandler) -> tuple[dict, dict, dict]:
+        """write the changes of a single source calendar to the target. returns updated, deleted and created events by id"""
+        plan = self.plan_sync([calendar])
+        self._apply_writes(plan)
+        if not plan.calendars:
+            return {}, {}, {}
+        done = plan.calendars[0].done
+        return done["update"], done["delete"], done["create"]
+
+    def plan_sync(self, calendars: list[CalendarHandler] | None = None) -> SyncPlan:
+        """compare source calendars with the target and collect all writes without changing any calendar"""
+        start = time.perf_counter()
+        plan = SyncPlan()
+        for calendar in self.calendars if calendars is None else calendars:
+            if calendar.read_failed:
+                logger.warning(f'Skipping sync of "{calendar.cal_name}" as it could not be read')
+                plan.unreadable.append(calendar)
+                continue
 
-            msg = f'Done comparing with "{calendar.cal_name}". '
-            msg += f"{len(changed)} entries updated. "
-            msg += f"{len(new)} entries added. "
-            msg += f"{len(deleted)} entries deleted."
-            logger.success(msg)
+            calendar_plan = plan.add_calendar(calendar)
+            source_cal = calendar.events_data
+            target_cal = self.target.search_events_by_calid(calendar.chronos_id)
+            self._plan_updates(calendar_plan, source_cal, target_cal)
+            self._plan_deletes(calendar_plan, source_cal, target_cal)
+            self._plan_creates(calendar_plan, source_cal, target_cal)
 
-    def sync_calendar(self, calendar: CalendarHandler) -> tuple[dict, dict, dict]:
-        # Update target calendar events from source calendar
-        changed = self._update_target_events(calendar)
-        # delete iCal event not in source calendar
-        deleted = self._delete_target_events(calendar)
-        # create iCal event only in source calendar
-        new = self._create_target_events(calendar)
-        return changed, deleted, new
-
-    def _update_target_events(self, calendar: CalendarHandler) -> dict:
-        """Update target calendar events"""
-
-        source_cal = calendar.events_data
-        target_cal = self.target.search_events_by_calid(calendar.chronos_id)
-        changeSet = set(target_cal).intersection(set(source_cal))
-        changed = {}
-
-        for event_id in changeSet:
+        plan.planning_seconds = time.perf_counter() - start
+        logger.debug(f"Planned {plan.summary()} in {plan.planning_seconds:.2f}s")
+        return plan
+
+    def _plan_updates(self, calendar_plan: CalendarPlan, source_cal: dict, target_cal: dict) -> None:
+        """update target events whose source changed since the last write"""
+        for event_id in set(target_cal).intersection(set(source_cal)):
             tgt = target_cal[event_id]
             src = source_cal[event_id]
             # TODO: (Re)Implement respect remote changes
             # if src.last_modified > tgt.last_modified and not tgt.remote_changed:
-            if src.last_modified > tgt.last_modified:
-                try:
-                    updated_event = tgt.update_calDaV_event(src)
-                    changed[event_id] = updated_event
-
-                    logger.info(f"Updated: {updated_event.date} | {updated_event.safe_title}")
-                except Exception as ex:
-                    logger.error(f"Could not update event: {ex}")
-
-        return changed
-
-    def _delete_target_events(self, calendar: CalendarHandler) -> dict:
-        """delete target iCal events not in source calendar"""
+            if src.last_modified <= tgt.last_modified:
+                calendar_plan.skip("not_modified")
+                continue
+            if tgt.content_hash == src.md5 and not src.is_hidden:
+                logger.debug(f"Unchanged after rendering: {src.date} | {src.safe_title}")
+                calendar_plan.skip("unchanged")
+                continue
+            calendar_plan.add("update", event_id, src, self._resource_size(tgt), partial(tgt.update_calDaV_event, src))
 
+    def _plan_deletes(self, calendar_plan: CalendarPlan, source_cal: dict, target_cal: dict) -> None:
+        """delete target events created by chronos which are not in the source calendar"""
         wipe_on_target = self.app_config.get("calendars", "delete_on_target")
         if not wipe_on_target:
-            return {}
-
-        source_cal = calendar.events_data
-        target_cal = self.target.search_events_by_calid(calendar.chronos_id)
-        deleteSet = set(target_cal).difference(set(source_cal))
-        deleted = {}
-
-        for event_id in deleteSet:
-            try:
-                if target_cal[event_id].is_chronos_origin:
-                    del_event = target_cal[event_id]
-                    del_event.calDAV.delete()
-                    logger.info(f"Deleted: {del_event.date} | {del_event.safe_title}")
-                    deleted[event_id] = del_event
-            except Exception as ex:
-                logger.error(f"Could not delete obsolete event: {ex}")
-
-        return deleted
+            return
 
-    def _create_target_events(self, calendar: CalendarHandler) -> dict:
-        """create iCal events only in source calendar"""
-        source_cal = calendar.events_data
-        target_cal = self.target.search_events_by_calid(calendar.chronos_id)
-        newSet = set(source_cal).difference(set(target_cal))
-        new_events: dict[icalendar.vText, ChronosEvent] = {}
+        for event_id in set(target_cal).difference(set(source_cal)):
+            if target_cal[event_id].is_chronos_origin:
+                calendar_plan.add("delete", event_id, target_cal[event_id], 0, target_cal[event_id].calDAV.delete)
 
-        for event_id in newSet:
+    def _plan_creates(self, calendar_plan: CalendarPlan, source_cal: dict, target_cal: dict) -> None:
+        """create target events for source events not on the target"""
+        calendar = calendar_plan.calendar
+        for event_id in set(source_cal).difference(set(target_cal)):
             new_event = source_cal[event_id]
             if not (new_event.has_title):
                 logger.debug(f"Ignoring event without title: {new_event.date}")
-                continue
-            if new_event.is_confidential:
+                reason = "no_title"
+            elif new_event.is_confidential:
                 logger.debug(f"Ignoring confidential event: {new_event.date}")
-                continue
-            if new_event.is_excluded:
+                reason = "confidential"
+            elif new_event.is_excluded:
                 logger.debug(f"Ignoring event excluded by tag: {new_event.date}")
-                continue
-            if (calendar.ignore_planned and new_event.is_planned) or new_event.is_canceled:
+                reason = "excluded"
+            elif (calendar.ignore_planned and new_event.is_planned) or new_event.is_canceled:
                 logger.debug(f"Ignoring {new_event.status} event: {new_event.date} | {new_event.safe_title}")
                 # skip planned events
+                reason = "canceled" if new_event.is_canceled else "planned"
+            else:
+                reason = None
+
+            if reason is not None:
+                self.metrics.count_filtered(calendar.cal_name, reason)
+                calendar_plan.skip(reason)
                 continue
 
+            # rendered once. the size of the plan is exact and the write only sends it
             try:
                 _cal = icalendar.Calendar()
-                vevent = new_event.create_ical_event()
-
-                _cal.add_component(vevent)
-                _new = _cal.to_ical()
-                self.target.calendar.add_event(_new, no_overwrite=True, no_create=False)
-                logger.info(f"Created: {new_event.date} | {new_event.safe_title}")
-                new_events[event_id] = new_event
+                _cal.add_component(new_event.create_ical_event())
+                size = len(_cal.to_ical())
             except Exception as ex:
+                self.metrics.count(calendar.cal_name, "write_failures")
                 logger.error(f"Could not create new event: {ex}")
-                if new_event is not None and hasattr(new_event, "title") and hasattr(new_event, "date"):
-                    logger.error(f"Affected event: {new_event.safe_title} {new_event.date}")
+                logger.error(f"Affected event: {new_event.safe_title} {new_event.date}")
+                continue
+            calendar_plan.add("create", event_id, new_event, size, partial(self._create_target_event, _cal))
 
-        return new_events
+    @staticmethod
+    def _resource_size(event: ChronosEvent) -> int:
+        """size of the resource on the calendar. estimates the body of an update"""
+        try:
+            return len(event.calDAV.data.encode("utf-8"))
+        except Exception:
+            return 0
+
+    def apply_plan(self, plan: SyncPlan) -> None:
+        """apply the writes of a plan and store the state of the synced calendars"""
+        for calendar in plan.unreadable:
+            self._update_poll_schedule(calendar, True)
+
+        self._apply_writes(plan)
+
+        app_timezone = self.app_config.runtime.timezone
+        for calendar_plan in plan.calendars:
+            calendar = calendar_plan.calendar
+            changed, deleted, new = (calendar_plan.done[action] for action in ("update", "delete", "create"))
+            self.metrics.count(calendar.cal_name, "updated", len(changed))
+            self.metrics.count(calendar.cal_name, "deleted", len(deleted))
+            self.metrics.count(calendar.cal_name, "created", len(new))
+            calendar.last_check = dt.datetime.now().astimezone(app_timezone)
+            calendar.save_state()
+            sanitized = self.metrics.calendars.get(calendar.cal_name, {}).get("sanitize_writes", 0)
+            self._update_poll_schedule(calendar, bool(changed or deleted or new or sanitized))
+
+            msg = f'Done comparing with "{calendar.cal_name}". '
+            msg += f"{len(changed)} entries updated. "
+            msg += f"{len(new)} entries added. "
+            msg += f"{len(deleted)} entries deleted."
+            logger.success(msg)
+
+    def _apply_writes(self, plan: SyncPlan) -> None:
+        """every action is one batch over all calendars, running on the write workers"""
+        for action in ACTIONS:
+            done, failed = self._run_writes({write: write.operation for write in plan.batch(action)})
+            for write, result in done.items():
+                getattr(self, f"_finish_{action}")(write, result)
+            for write, ex in failed.items():
+                self.metrics.count(write.calendar.calendar.cal_name, "write_failures")
+                self._log_failed_write(write, ex)
+
+    def _finish_update(self, write: PlannedWrite, updated_event: ChronosEvent) -> None:
+        if write.event.is_hidden:
+            self.target.remove_event(write.event_id)
+        write.calendar.done["update"][write.event_id] = updated_event
+        logger.info(f"Updated: {updated_event.date} | {updated_event.safe_title}")
+
+    def _finish_delete(self, write: PlannedWrite, result) -> None:
+        del_event = write.event
+        logger.info(f"Deleted: {del_event.date} | {del_event.safe_title}")
+        write.calendar.done["delete"][write.event_id] = del_event
+        self.target.remove_event(write.event_id)
+
+    def _finish_create(self, write: PlannedWrite, resource) -> None:
+        new_event = write.event
+        logger.info(f"Created: {new_event.date} | {new_event.safe_title}")
+        write.calendar.done["create"][write.event_id] = new_event
+        self._register_created_event(resource)
+
+    @staticmethod
+    def _log_failed_write(write: PlannedWrite, ex: Exception) -> None:
+        if write.action == "update":
+            logger.error(f"Could not update event: {ex}")
+        elif write.action == "delete":
+            logger.error(f"Could not delete obsolete event: {ex}")
+        else:
+            logger.error(f"Could not create new event: {ex}")
+            logger.error(f"Affected event: {write.event.safe_title} {write.event.date}")
+
+    def write_plan(self, plan: SyncPlan, filename: Path | None = None) -> None:
+        """write the plan to the given file or the --plan-file of the command line"""
+        filename = filename if filename is not None else getattr(self.app_config.appCL, "plan_file", None)
+        if filename is None:
+            return
+        try:
+            plan.write(filename)
+            logger.debug(f"Sync plan written to {filename}")
+        except Exception as ex:
+            logger.error(f"Could not write sync plan. Reason: {ex}")
+
+    def _update_poll_schedule(self, calendar: CalendarHandler, changed: bool) -> None:
+        if self.poll_schedule is None:
+            return
+        interval = self.poll_schedule.update(calendar.chronos_id, changed)
+        if interval:
+            logger.debug(f'No changes in "{calendar.cal_name}". Polling again in {interval / 60:.0f} minutes')
+
+    def _create_target_event(self, _cal: icalendar.Calendar):
+        # the returned resource keeps the calendar, so registering the created event needs no parsing
+        return self.target.calendar.add_event(_cal, no_overwrite=True, no_create=False)
+
+    def _run_writes(self, operations: dict) -> tuple[dict, dict]:
+        """
+        run write operations on the target calendar concurrently, limited by [app] write_workers.
+        returns results and exceptions by key
+        """
+        done, failed = {}, {}
+        if not operations:
+            return done, failed
+
+        max_workers = max(1, self.app_config.get("app", "write_workers"))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chronos-write") as executor:
+            futures = {executor.submit(operation): key for key, operation in operations.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    done[key] = future.result()
+                except Exception as ex:
+                    failed[key] = ex
+
+        return done, failed
+
+    def _register_created_event(self, resource) -> None:
+        """add a newly created target resource to the target events"""
+        try:
+            created_event = ChronosEvent(self.target)
+            created_event.calDAV = resource
+            created_event.populate_from_vcal_object()
+            self.target.add_event(created_event)
+        except Exception as ex:
+            logger.error(f"Could not register created event {resource.url}: {ex}")
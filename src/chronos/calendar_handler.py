@@ -1,46 +1,115 @@
 # -*- coding: utf-8 -*-
 
 # python lib
+from concurrent.futures import ProcessPoolExecutor
 from hashlib import md5
-from pathlib import Path
-from urllib.request import urlretrieve
+from itertools import compress
+from typing import Iterator
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
 import datetime as dt
+import io
 import logging
+import regex
 import time
 import zoneinfo
 
 # external libs
+from caldav.elements import cdav, dav
+from caldav.elements.base import BaseElement
+from caldav.lib import error as caldav_error
+from caldav.lib.url import URL
 import caldav
 import icalendar
 import x_wr_timezone
 
 # own code
 from chronos.config import Config
-from chronos.chronos_event import ChronosEvent
+from chronos.chronos_event import ChronosEvent, parse_event_blocks
+from chronos.dav_session import DAVSession, SessionRegistry
+from chronos.ics_reader import IcsStream, date_ordinal, event_header, event_properties, parse_event
+from chronos.metrics import RunMetrics
+from chronos.exclusion import ExclusionMatcher
+from chronos.helpers import UTC
+from chronos.run_context import RunContext
+from chronos.state_store import StateStore
 
 
 logger = logging.getLogger(__name__)
 
+# VEVENT with recurrence rule. RRULEs within VTIMEZONE components are ignored
+RECURRING_EVENT_PATTERN = regex.compile(r"BEGIN:VEVENT(?:(?!END:VEVENT).)*?^RRULE[:;]", flags=regex.DOTALL | regex.MULTILINE)
+# occurrences of recurring events as returned by an expanded search
+RECURRENCE_ID_PATTERN = regex.compile(r"^RECURRENCE-ID[:;]", flags=regex.MULTILINE)
+# resource containing an event created by chronos
+CHRONOS_EVENT_PATTERN = regex.compile(r"^X-ILSC-ORIGIN[;:]", flags=regex.MULTILINE)
+
+
+class GetCTag(BaseElement):
+    """collection tag (calendarserver.org). changes whenever any resource in the calendar changes"""
+
+    tag = "{http://calendarserver.org/ns/}getctag"
+
 
 class CalendarHandler:
     def __init__(self, app_config: Config):
         self.app_config = app_config
 
-        app_timezone = zoneinfo.ZoneInfo(self.app_config.get("app", "timezone"))
-        self.last_check = (dt.datetime.now() - dt.timedelta(days=7)).astimezone(app_timezone)
-        self.cal_timezone_info = zoneinfo.ZoneInfo("UTC")
+        self.last_check = (dt.datetime.now() - dt.timedelta(days=7)).astimezone(self.app_config.runtime.timezone)
+        self.cal_timezone_info = UTC
 
         self.events_data: dict[str, ChronosEvent] = {}
+        # set if the last read did not succeed. such calendars are skipped during sync
+        self.read_failed = False
+        # read only events created by chronos, e.g. on the target calendar. they are parsed once they get changed
+        self.chronos_only = False
 
         self.client = None
         self.calendar = None
         self.principal = None
+        # collection url resolved by discovery. opened directly while it is valid
+        self.calendar_url: str | None = None
+
+        # DAV sessions are shared between handlers on the same server (see AppFactory)
+        self.sessions: SessionRegistry | None = None
+        self.session: DAVSession | None = None
+
+        # incremental sync state. ctag and RFC 6578 sync-token of the collection and events per resource
+        self.ctag: str | None = None
+        self.sync_token: str | None = None
+        # end of the time range events were read for. later time ranges are searched when the run date moves it
+        self.window_end: dt.datetime | None = None
+        self._href_keys: dict[str, set] = {}
+
+        # lookup indexes of events created by chronos. calid -> {key: event} and tag -> {key}
+        self._calid_index: dict[str, dict] | None = None
+        self._tag_index: dict[str, set] = {}
+
+        # optional worker processes parsing large ICS files, shared between handlers (see AppFactory)
+        self.parse_pool: ProcessPoolExecutor | None = None
+
+        # validators of the last completely read ICS file
+        self._http_etag: str | None = None
+        self._http_last_modified: str | None = None
+        self._http_body_hash: str | None = None
+
+        # metrics and range limits of the current run, assigned by the AppFactory
+        self.metrics: RunMetrics | None = None
+        self.run_context: RunContext | None = None
+
+        # optional persistent state between runs
+        self.state: StateStore | None = None
+        self._restore_resources = False
+        self._resource_changes: dict[str, str | None] = {}
 
         # derived from calendars.json
         self.cal_primary = None
         self.cal_name = None
         self.cal_user = None
         self.cal_passwd = None
+        # seconds between polls on a job of its own. None: polled with the datacron job
+        self.poll_interval: int | None = None
 
         self.force_time = False  # affects only 24h allday events
         self.force_start = None
@@ -55,6 +124,7 @@ class CalendarHandler:
 
         self.tags_excluded = []
         self.exclude_event_by_strings_in_summary = []
+        self._exclusion_matcher: ExclusionMatcher | None = None
 
         self.sanitize = {"stati": True, "source_icons": True, "target_icons": True}
 
@@ -77,44 +147,164 @@ class CalendarHandler:
     def sanitize_icons_tgt(self) -> bool:
         return self.sanitize["target_icons"]
 
+    @property
+    def exclusion_matcher(self) -> ExclusionMatcher:
+        """tags_excluded and exclude_event_by_strings_in_summary compiled on first use"""
+        if self._exclusion_matcher is None:
+            self._exclusion_matcher = ExclusionMatcher(self.tags_excluded, self.exclude_event_by_strings_in_summary)
+        return self._exclusion_matcher
+
     def config(self, conf_data):
         for key, val in conf_data.items():
             if type(val) is dict:
                 setattr(self, key, {**getattr(self, key), **val})
             else:
                 setattr(self, key, val)
+        self._exclusion_matcher = None
+
+    def load_state(self) -> None:
+        """restore sync state of the last run from the state store"""
+        if self.state is None:
+            return
+
+        self.calendar_url = self.state.load_calendar_url(self.chronos_id)
+        stored = self.state.load_calendar(self.chronos_id)
+        if stored is None:
+            return
+
+        self.ctag, self.sync_token, self.window_end, last_check = stored
+        if last_check is not None:
+            self.last_check = last_check
+        self._restore_resources = self.ctag is not None or self.sync_token is not None
+        logger.debug(f'Restored state of "{self.cal_name}". Last check: {self.last_check}')
+
+    def save_state(self) -> None:
+        """write collection state and last check to the state store"""
+        if self.state is None:
+            return
+        self.state.save_calendar(self.chronos_id, self.cal_name, self.ctag, self.sync_token, self.window_end, self.last_check)
 
     def read(self) -> None:
         """read calendar events. decides if it is from a ICS file or from a CalDAV calendar."""
 
+        self._invalidate_index()
+        if self.run_context is None:
+            # handler used without the AppFactory
+            self.run_context = RunContext(self.app_config)
         if ".ics" in self.cal_primary or "?export" in self.cal_primary:
             self.read_ics_from_url()
         else:
             self.read_from_cal_dav()
 
     def read_ics_from_url(self):
-        """read events from .ics file from the calendars primary adress"""
+        """
+        read events from .ics file from the calendars primary adress. the file is parsed event by event.
+        uses a conditional request and keeps the events of the last read if the file did not change
+        """
+        limit_start_date, limit_end_date = self._search_range()
+        request_timeout = self.app_config.get("app", "request_timeout")
+
+        request = Request(self.cal_primary)
+        if self._http_etag:
+            request.add_header("If-None-Match", self._http_etag)
+        if self._http_last_modified:
+            request.add_header("If-Modified-Since", self._http_last_modified)
+
+        # TODO 2025-04-21 handle ICS file not being accessible
+        try:
+            response = urlopen(request, timeout=request_timeout)
+        except HTTPError as ex:
+            if self.metrics is not None:
+                self.metrics.record_request("GET", ex.code, 0, 0)
+            if ex.code != 304:
+                raise
+            logger.debug(f'ICS calendar "{self.cal_name}" not modified since last read')
+            self._prune_events(limit_start_date, limit_end_date, strict=True)
+            return
+
+        with response:
+            contents = response.read()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+        if self.metrics is not None:
+            self.metrics.record_request("GET", response.status, 0, len(contents))
+
+        body_hash = md5(contents).hexdigest()
+        if body_hash == self._http_body_hash:
+            logger.debug(f'ICS calendar "{self.cal_name}" unchanged since last read')
+            self._http_etag, self._http_last_modified = etag, last_modified
+            self._prune_events(limit_start_date, limit_end_date, strict=True)
+            return
 
-        # reset data first
+        # reset data first. validators are only kept for completely parsed files
         self.events_data = {}
+        self._http_etag, self._http_last_modified, self._http_body_hash = None, None, None
+
+        stream = IcsStream(io.TextIOWrapper(io.BytesIO(contents), encoding="utf-8"))
+        is_header_checked = False
+        blocks = []
+
+        for block in stream.events():
+            # calendar properties and timezones precede the events
+            if not is_header_checked:
+                if not self._check_ics_header(stream):
+                    return
+                is_header_checked = True
+            blocks.append(block)
+        self._count_fetched(len(blocks))
+
+        for new_chronos_event in self._parse_ics_events(self._prefilter_ics_events(blocks)):
+            # Only handle public events and those not containing exclude tags
+            reason = self._filter_reason(new_chronos_event)
+            if reason is not None:
+                logger.info(f"Skipping further ical parsing on confidential or excluded event: {new_chronos_event.uid} | Source: {self.cal_name}")
+                self._count_filtered(reason)
+                continue
 
-        # can't open ICS file directly, so first download
-        pathname_tmp = Path("./tmp")
-        pathname_tmp.mkdir(parents=True, exist_ok=True)
-        fn_cal = pathname_tmp / f"tmp_{self.cal_name}.ics"
-        urlretrieve(self.cal_primary, fn_cal)
+            new_chronos_event.populate_from_vcal_object()
 
-        # TODO 2025-04-21 handle ICS file not being accessible
+            # check for limits
+            if self._as_utc_datetime(new_chronos_event.dt_start) < limit_start_date:
+                # print("event is in the past")
+                self._count_filtered("out_of_range")
+                continue
+
+            if self._as_utc_datetime(new_chronos_event.dt_end) > limit_end_date:
+                # print("event is in the far future")
+                self._count_filtered("out_of_range")
+                continue
 
-        with fn_cal.open(encoding="utf-8") as f:
-            calendar_contents = f.read()
-            ics_calendar = icalendar.Calendar.from_ical(calendar_contents)
+            self.events_data[new_chronos_event.key] = new_chronos_event
 
-        # safety check for correct calendar
-        if str(ics_calendar["X-WR-CALNAME"]) != self.cal_name:
-            logger.error(f"mismatch of calendar name ({ics_calendar['X-WR-CALNAME']=} vs {self.cal_name=})")
+        self._http_etag, self._http_last_modified, self._http_body_hash = etag, last_modified, body_hash
+
+    def _parse_ics_events(self, blocks: list[list[str]]) -> Iterator[ChronosEvent]:
+        """parse VEVENT blocks. large files are parsed in chunks by the worker processes of parse_pool if available"""
+        chunk_size = max(1, self.app_config.get("calendars", "parse_chunk_size"))
+        if self.parse_pool is None or len(blocks) < 2 * chunk_size:
+            for block in blocks:
+                new_chronos_event = ChronosEvent(self)
+                new_chronos_event._ics_event = parse_event(block)
+                yield new_chronos_event
             return
 
+        chunks = [blocks[i : i + chunk_size] for i in range(0, len(blocks), chunk_size)]
+        logger.debug(f'Parsing {len(blocks)} events of "{self.cal_name}" in {len(chunks)} chunks')
+        for records in self.parse_pool.map(parse_event_blocks, chunks):
+            for record in records:
+                new_chronos_event = ChronosEvent(self)
+                new_chronos_event._data = record
+                yield new_chronos_event
+
+    def _check_ics_header(self, stream: IcsStream) -> bool:
+        """check calendar name and determine the calendars timezone from the ICS header"""
+        ics_calendar = stream.header_calendar()
+
+        # safety check for correct calendar
+        if str(ics_calendar.get("X-WR-CALNAME")) != self.cal_name:
+            logger.error(f"mismatch of calendar name ({ics_calendar.get('X-WR-CALNAME')=} vs {self.cal_name=})")
+            return False
+
         # use standardized format for timezone and find timezone
         standardized_icalendar = x_wr_timezone.to_standard(ics_calendar, add_timezone_component=True)
         timezone_id: str | None = None
@@ -125,62 +315,56 @@ class CalendarHandler:
         self.cal_timezone_info = zoneinfo.ZoneInfo(timezone_id)
 
         # compare with the time zone of the target calendar
-        timezone_from_config = self.app_config.get("app", "timezone")
-        target_timezone = zoneinfo.ZoneInfo(timezone_from_config)
+        target_timezone = self.app_config.runtime.timezone
         if target_timezone != self.cal_timezone_info:
             logger.warning(f"timezone of calendar ({self.cal_timezone_info}) is not the same as the target calendars timezone ({target_timezone})")
+        return True
 
-        for event in ics_calendar.walk("VEVENT"):
-            new_chronos_event = ChronosEvent(self)
-            new_chronos_event._ics_event = event.copy()
-
-            # Only handle public events and those not containing exclude tags
-            is_invalid_event = new_chronos_event.is_confidential or new_chronos_event.is_excluded or new_chronos_event.date_out_of_range
-            if is_invalid_event:
-                logger.info(f"Skipping further ical parsing on confidential or excluded event: {new_chronos_event.uid} | Source: {self.cal_name}")
-                continue
-
-            new_chronos_event.populate_from_vcal_object()
-
-            # TODO 2025-06-11 put into helper function for date range check
-            # determine limits of time range with timezone info
-            today_in_the_morning_utc = dt.datetime.today().replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=zoneinfo.ZoneInfo("UTC"))
-            range_min = self.app_config.get("calendars", "range_min")
-            limit_start_date = today_in_the_morning_utc + dt.timedelta(days=range_min)
-            range_max = self.app_config.get("calendars", "range_max")
-            limit_end_date = today_in_the_morning_utc + dt.timedelta(days=range_max)
-
-            # handle different input types (dt.date or dt.datetime) with timezone info
-            if isinstance(new_chronos_event.dt_start, dt.datetime):
-                dt_start = new_chronos_event.dt_start
-            else:
-                dt_start = dt.datetime(
-                    year=new_chronos_event.dt_start.year,
-                    month=new_chronos_event.dt_start.month,
-                    day=new_chronos_event.dt_start.day,
-                    tzinfo=zoneinfo.ZoneInfo("UTC"),
-                )
-
-            if isinstance(new_chronos_event.dt_end, dt.datetime):
-                dt_end = new_chronos_event.dt_end
-            else:
-                dt_end = dt.datetime(
-                    year=new_chronos_event.dt_end.year,
-                    month=new_chronos_event.dt_end.month,
-                    day=new_chronos_event.dt_end.day,
-                    tzinfo=zoneinfo.ZoneInfo("UTC"),
-                )
-
-            # check for limits
-            if dt_start < limit_start_date:
-                # print("event is in the past")
-                continue
-
-            if dt_end > limit_end_date:
-                # print("event is in the far future")
-                continue
-
-            self.events_data[new_chronos_event.key] = new_chronos_event
+    def _prefilter_ics_events(self, blocks: list[list[str]]) -> list[list[str]]:
+        """
+        drop events by their raw properties before they get parsed. only the header properties of each event are
+        read to compare ordinal days and classes. exact checks follow after parsing
+        """
+        context = self.run_context
+        headers = [event_header(block) for block in blocks]
+        # ordinal days. 0 if unknown, such events are kept
+        starts = [date_ordinal(header.get("DTSTART")) for header in headers]
+        ends = [date_ordinal(header.get("DTEND")) for header in headers]
+        confidential = [header.get("CLASS", "PUBLIC").upper() != "PUBLIC" for header in headers]
+
+        first, last = context.first_ordinal, context.last_ordinal
+        in_range = [not start or (first <= start <= last and end <= last) for start, end in zip(starts, ends)]
+        mask = [not is_confidential and is_in_range for is_confidential, is_in_range in zip(confidential, in_range)]
+
+        nr_confidential = sum(confidential)
+        for header in compress(headers, confidential):
+            logger.info(f"Skipping further ical parsing on confidential or excluded event: {header.get('UID')} | Source: {self.cal_name}")
+        kept = list(compress(blocks, mask))
+        nr_out_of_range = len(blocks) - nr_confidential - len(kept)
+        if nr_confidential:
+            self._count_filtered("confidential", nr_confidential)
+        if nr_out_of_range:
+            self._count_filtered("out_of_range", nr_out_of_range)
+        return kept
+
+    def _filter_reason(self, event: ChronosEvent) -> str | None:
+        """reason why an event is not read. None for events to sync"""
+        if event.is_confidential:
+            return "confidential"
+        if event.is_excluded:
+            return "excluded"
+        if event.date_out_of_range:
+            return "out_of_range"
+        return None
+
+    def _count_filtered(self, reason: str, amount: int = 1) -> None:
+        if self.metrics is not None:
+            self.metrics.count_filtered(self.cal_name, reason, amount)
+
+    def _count_fetched(self, amount: int = 1) -> None:
+        """count received CalDAV resources or VEVENT blocks of an ICS file, before any filtering"""
+        if self.metrics is not None:
+            self.metrics.count(self.cal_name, "events_fetched", amount)
 
     def read_from_cal_dav(self) -> None:
         """read events from caldav calendar"""
@@ -188,67 +372,333 @@ class CalendarHandler:
 
         start = time.time()
         try:
-            self.client = caldav.DAVClient(self.cal_primary, username=self.cal_user, password=self.cal_passwd)
-            self.principal = self.client.principal()
+            if self.sessions is None:
+                self.sessions = SessionRegistry(
+                    self.app_config.get("app", "connection_ttl"),
+                    self.app_config.get("app", "request_timeout"),
+                    self.app_config.get("app", "write_workers"),
+                )
+            self.session = self.sessions.get(self.cal_primary, self.cal_user, self.cal_passwd)
+            self.client = self.session.client
         except Exception as ex:
             logger.critical(f"Error on CALDav auth: {ex}")
             raise
 
-        self.events_data = {}
-
         logger.debug("Time needed: {:.2f}s".format(time.time() - start))
         start = time.time()
 
         logger.debug("Reading Events")
-        list_available_calendars = self.available_calendars()
-        for calendar in list_available_calendars:
-            if calendar.name != self.cal_name:
-                continue
-
-            self.calendar = calendar
-            # TODO: Check if timezone or utc converion is needed
-            # had to add 2 hours else duplicates are created
-            today_in_the_morning_utc = dt.datetime.today().replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=zoneinfo.ZoneInfo("UTC"))
-            range_min = self.app_config.get("calendars", "range_min")
-            limit_start_date = today_in_the_morning_utc + dt.timedelta(days=range_min)
-            range_max = self.app_config.get("calendars", "range_max")
-            limit_end_date = today_in_the_morning_utc + dt.timedelta(days=range_max)
-
-            logger.debug(f'Checking calendar "{self.cal_name}" for dates in range: {limit_start_date} to {limit_end_date}')
-
-            try:
-                upcoming_events = calendar.search(
-                    start=limit_start_date,
-                    end=limit_end_date,
-                    event=True,
-                    expand=True,
-                )
-            except Exception:
-                # print("Your calendar server does apparently not support expanded search")
-                upcoming_events = calendar.search(
-                    start=limit_start_date,
-                    end=limit_end_date,
-                    event=True,
-                    expand=False,
-                )
+        from_cached_url = self.calendar_url is not None
+        if from_cached_url:
+            self.calendar = self.client.calendar(url=self.calendar_url, name=self.cal_name)
+        else:
+            self._discover_calendar()
 
-            # get all events
-            for event in upcoming_events:
-                if event.data:
-                    try:
-                        self.read_event(event)
-                    except Exception as ex:
-                        logger.error(f"Error reading event: {ex}")
+        try:
+            self._read_calendar()
+        except caldav_error.NotFoundError:
+            if not from_cached_url:
+                raise
+            # calendar was moved or deleted. state of the old collection is of no use
+            logger.warning(f'Calendar "{self.cal_name}" not found at {self.calendar_url}. Searching it again')
+            self.ctag = None
+            self.sync_token = None
+            self._restore_resources = False
+            self._discover_calendar(refresh=True)
+            self._read_calendar()
+
+        self.save_state()
 
         # uncomment as helper to check fetched events sorted by sektion and dates
         # dates = [value.key for (key, value) in sorted(self.events_data.items(), reverse=False)]
         logger.debug("Time needed: {:.2f}s".format(time.time() - start))
 
+    def _discover_calendar(self, refresh: bool = False) -> None:
+        """find the calendar by name in the calendars of the principal and remember its url"""
+        self.principal = self.session.principal
+        self.calendar = self._find_calendar(self.available_calendars(refresh=refresh))
+        if self.calendar is None and not refresh:
+            # calendar may have been created after the session discovered the calendars
+            self.calendar = self._find_calendar(self.available_calendars(refresh=True))
+
         if self.calendar is None:
+            self.events_data = {}
+            self._forget_calendar_url()
             raise ValueError(f"read_from_cal_dav: target calendar '{self.cal_name}' was not found!")
 
-    def available_calendars(self) -> list[caldav.Calendar]:
-        calendars = self.principal.calendars()
+        self.calendar_url = str(self.calendar.url)
+        if self.state is not None:
+            self.state.save_calendar_url(self.chronos_id, self.cal_name, self.calendar_url)
+
+    def _forget_calendar_url(self) -> None:
+        self.calendar_url = None
+        if self.state is not None:
+            self.state.save_calendar_url(self.chronos_id, self.cal_name, None)
+
+    def _read_calendar(self) -> None:
+        """read events of self.calendar. incremental if a previous collection state is known"""
+        # TODO: Check if timezone or utc converion is needed
+        # had to add 2 hours else duplicates are created
+        limit_start_date, limit_end_date = self._search_range()
+
+        incremental_sync = self.app_config.get("calendars", "incremental_sync")
+        if incremental_sync and self._restore_resources:
+            self._restore_events()
+
+        if incremental_sync and (self.ctag is not None or self.sync_token is not None):
+            try:
+                self._read_incremental(limit_start_date, limit_end_date)
+            except caldav_error.NotFoundError:
+                raise
+            except Exception as ex:
+                logger.warning(f'Incremental read of "{self.cal_name}" failed. Falling back to full read. Reason: {ex}')
+                self._read_full(limit_start_date, limit_end_date)
+        else:
+            self._read_full(limit_start_date, limit_end_date)
+
+    def _find_calendar(self, calendars: list[caldav.Calendar]) -> caldav.Calendar | None:
+        for calendar in calendars:
+            if calendar.name == self.cal_name:
+                return calendar
+        return None
+
+    def _search_range(self) -> tuple[dt.datetime, dt.datetime]:
+        """return start and end of the configured time range"""
+        return self.run_context.limit_start_date, self.run_context.limit_end_date
+
+    def _read_full(self, limit_start_date: dt.datetime, limit_end_date: dt.datetime) -> None:
+        """read all events within the given time range"""
+        self.events_data = {}
+        self._href_keys = {}
+        self._resource_changes = {}
+
+        # fetch collection state first. changes during the search are picked up by the next read
+        if self.app_config.get("calendars", "incremental_sync"):
+            self.ctag, self.sync_token = self._collection_state()
+
+        logger.debug(f'Checking calendar "{self.cal_name}" for dates in range: {limit_start_date} to {limit_end_date}')
+
+        upcoming_events = [event for event in self._search_events(limit_start_date, limit_end_date) if event.data]
+        self._count_fetched(len(upcoming_events))
+
+        # get all events
+        for event in upcoming_events:
+            try:
+                self.read_event(event)
+            except Exception as ex:
+                logger.error(f"Error reading event: {ex}")
+
+        self.window_end = limit_end_date
+        self._save_resources(replace=True)
+
+    def _search_events(self, limit_start_date: dt.datetime, limit_end_date: dt.datetime) -> list[caldav.Event]:
+        """search events within the given time range. recurring events are expanded if the server supports it"""
+        if self.chronos_only:
+            return self._search_chronos_events(limit_start_date, limit_end_date)
+        try:
+            return self.calendar.search(
+                start=limit_start_date,
+                end=limit_end_date,
+                event=True,
+                expand=True,
+            )
+        except Exception:
+            # print("Your calendar server does apparently not support expanded search")
+            return self.calendar.search(
+                start=limit_start_date,
+                end=limit_end_date,
+                event=True,
+                expand=False,
+            )
+
+    def _search_chronos_events(self, limit_start_date: dt.datetime, limit_end_date: dt.datetime) -> list[caldav.Event]:
+        """
+        search events created by chronos with a prop-filter on X-ILSC-ORIGIN. falls back to the plain time range search
+        if the server rejects the filter or finds nothing. read_event drops foreign events in both cases
+        """
+        app_id = self.app_config.runtime.app_id
+        event_filter = cdav.CompFilter("VEVENT") + [
+            cdav.TimeRange(limit_start_date, limit_end_date),
+            cdav.PropFilter("X-ILSC-ORIGIN") + cdav.TextMatch(app_id),
+        ]
+        query = cdav.CalendarQuery() + [dav.Prop() + cdav.CalendarData(), cdav.Filter() + (cdav.CompFilter("VCALENDAR") + event_filter)]
+
+        try:
+            upcoming_events = self.calendar.search(xml=query, post_filter=False)
+            if upcoming_events:
+                return upcoming_events
+            # servers may also answer unsupported filters with an empty result
+            logger.debug(f'Filtered search on "{self.cal_name}" found no events. Searching all events')
+        except Exception as ex:
+            logger.debug(f'Filtered search on "{self.cal_name}" failed. Searching all events. Reason: {ex}')
+
+        return self.calendar.search(start=limit_start_date, end=limit_end_date, event=True, expand=False)
+
+    def _read_incremental(self, limit_start_date: dt.datetime, limit_end_date: dt.datetime) -> None:
+        """
+        patch events_data with changes since the last read.
+        fetches changed and deleted hrefs by sync-token unless the ctag did not change. events that are unchanged
+        but moved into the time range since the last read are searched in the new part of the range only
+        """
+        if self.window_end is None:
+            raise ValueError("no time range of the last read available")
+
+        ctag, sync_token = self._collection_state()
+        self._rebind_events()
+        self._resource_changes = {}
+
+        nr_updated = 0
+        nr_deleted = 0
+        if ctag is not None and ctag == self.ctag:
+            logger.debug(f'Calendar "{self.cal_name}" unchanged since last read')
+        else:
+            if self.sync_token is None:
+                raise ValueError("no sync-token available")
+
+            new_sync_token, changed_hrefs, deleted_hrefs = self._sync_collection(self.sync_token)
+            for href in changed_hrefs + deleted_hrefs:
+                self._drop_href(href)
+            nr_deleted = len(deleted_hrefs)
+
+            for calEvent in self._multiget(changed_hrefs):
+                # resources deleted since the sync report come without data
+                if not calEvent.data:
+                    continue
+                self._count_fetched()
+                nr_updated += self._read_incremental_event(calEvent, "recurring event changed")
+
+            self.ctag = ctag
+            self.sync_token = new_sync_token if new_sync_token else sync_token
+
+        if limit_end_date > self.window_end:
+            logger.debug(f'Checking calendar "{self.cal_name}" for dates in range: {self.window_end} to {limit_end_date}')
+            for calEvent in self._search_events(self.window_end, limit_end_date):
+                if not calEvent.data:
+                    continue
+                self._count_fetched()
+                # other occurrences of the series were read by the last read and must not be dropped
+                if RECURRENCE_ID_PATTERN.search(calEvent.data):
+                    raise ValueError(f"recurring event in new time range: {calEvent.url}")
+                # the event may have been read already if it changed since the last read
+                self._drop_href(str(calEvent.url.canonical()))
+                nr_updated += self._read_incremental_event(calEvent, "recurring event in new time range")
+            self.window_end = limit_end_date
+
+        self._prune_events(limit_start_date, limit_end_date)
+        self._save_resources()
+        logger.debug(f'Incremental read of "{self.cal_name}": {nr_updated} changed, {nr_deleted} deleted')
+
+    def _read_incremental_event(self, calEvent: caldav.Event, reason: str) -> int:
+        """read a single resource of an incremental read. return the number of resources read"""
+        # expansion of recurring events is done by the server side search of a full read only
+        if RECURRING_EVENT_PATTERN.search(calEvent.data):
+            raise ValueError(f"{reason}: {calEvent.url}")
+
+        try:
+            self.read_event(calEvent)
+            return 1
+        except Exception as ex:
+            logger.error(f"Error reading event: {ex}")
+            return 0
+
+    def _sync_collection(self, sync_token: str) -> tuple[str | None, list[str], list[str]]:
+        """
+        sync-collection report (RFC 6578) since the given token. returns the new token and the canonical hrefs of
+        changed and deleted resources. deleted resources are reported with status 404
+        """
+        query = dav.SyncCollection() + [dav.SyncLevel(value="1"), dav.SyncToken(value=sync_token), dav.Prop() + dav.GetEtag()]
+        response = self.calendar._query(query, 1, "report")
+        response.find_objects_and_props()
+
+        changed, deleted = [], []
+        for href, status in response.statuses.items():
+            url = self.calendar.url.join(URL(quote(href)))
+            # some servers report the collection itself
+            if url == self.calendar.url:
+                continue
+            is_deleted = status is not None and "404" in status
+            (deleted if is_deleted else changed).append(str(url.canonical()))
+        return getattr(response, "sync_token", None), changed, deleted
+
+    def _multiget(self, hrefs: list[str]) -> list[caldav.Event]:
+        """fetch resources with one calendar-multiget report instead of a GET each"""
+        if not hrefs:
+            return []
+        query = cdav.CalendarMultiGet() + [dav.Prop() + cdav.CalendarData()] + [dav.Href(value=URL(href).path) for href in hrefs]
+        _, events = self.calendar._request_report_build_resultlist(query, caldav.Event)
+        return events
+
+    def _collection_state(self) -> tuple[str | None, str | None]:
+        """fetch ctag and sync-token of the calendar collection. each may be None if not supported by the server"""
+        props = self.calendar.get_properties([GetCTag(), dav.SyncToken()])
+        return props.get(GetCTag.tag), props.get(dav.SyncToken.tag)
+
+    def _restore_events(self) -> None:
+        """rebuild events_data from resources stored by the last run"""
+        self._restore_resources = False
+        try:
+            resources = self.state.load_resources(self.chronos_id)
+            for href, data in resources.items():
+                try:
+                    self.read_event(caldav.Event(client=self.client, url=href, data=data, parent=self.calendar))
+                except Exception as ex:
+                    logger.error(f"Error restoring event: {ex}")
+            logger.debug(f'Restored {len(self.events_data)} events of "{self.cal_name}" from state store')
+        except Exception as ex:
+            logger.warning(f'Could not restore events of "{self.cal_name}". Reason: {ex}')
+            self.ctag = None
+            self.sync_token = None
+        self._resource_changes = {}
+
+    def _save_resources(self, replace: bool = False) -> None:
+        if self.state is None:
+            return
+        self.state.save_resources(self.chronos_id, self._resource_changes, replace=replace)
+        self._resource_changes = {}
+
+    def _rebind_events(self) -> None:
+        """attach events kept from the last read to the current connection"""
+        for event in self.events_data.values():
+            if event.calDAV is not None:
+                event.calDAV.client = self.client
+                event.calDAV.parent = self.calendar
+
+    def _drop_href(self, href: str) -> None:
+        """remove all events read from the given resource"""
+        self._resource_changes[href] = None
+        for key in self._href_keys.pop(href, set()):
+            event = self.events_data.get(key)
+            if event is not None and event.calDAV is not None and str(event.calDAV.url.canonical()) == href:
+                del self.events_data[key]
+
+    def _prune_events(self, limit_start_date: dt.datetime, limit_end_date: dt.datetime, strict: bool = False) -> None:
+        """
+        remove events which moved out of the time range since they were read.
+        strict requires events to lie completely within the range (ICS files) instead of overlapping it (CalDAV search)
+        """
+        for key, event in list(self.events_data.items()):
+            event_start = self._as_utc_datetime(event.dt_start)
+            event_end = self._as_utc_datetime(event.dt_end)
+            if strict:
+                is_out_of_range = event_start < limit_start_date or event_end > limit_end_date
+            else:
+                is_out_of_range = event_end < limit_start_date or event_start > limit_end_date
+            if is_out_of_range:
+                del self.events_data[key]
+
+    @staticmethod
+    def _as_utc_datetime(date_or_datetime: dt.date | dt.datetime) -> dt.datetime:
+        if isinstance(date_or_datetime, dt.datetime):
+            return date_or_datetime
+        return dt.datetime(
+            year=date_or_datetime.year,
+            month=date_or_datetime.month,
+            day=date_or_datetime.day,
+            tzinfo=UTC,
+        )
+
+    def available_calendars(self, refresh: bool = False) -> list[caldav.Calendar]:
+        calendars = self.session.calendars(refresh=refresh)
         logger.info(f"Fetching available calendars on: {self.cal_name}")
         logger.debug("Found:")
 
@@ -260,7 +710,16 @@ class CalendarHandler:
     def read_event(self, calEvent: caldav.Event) -> None:
         """read event data"""
         # TODO: Clean this mess. As there should only be one vevent component. at least if caldav filter is working
-        cal = icalendar.Calendar.from_ical(calEvent.data)
+        href = str(calEvent.url.canonical())
+        if self.chronos_only:
+            self._read_chronos_event(calEvent, href)
+            return
+
+        # setting the parsed calendar clears the raw data of the resource
+        raw = calEvent.data
+        cal = icalendar.Calendar.from_ical(raw)
+        # the resource keeps the parsed calendar. it is not parsed again and only serialized when saved
+        calEvent.icalendar_instance = cal
         components = cal.walk("vevent")
         # logger.debug(f'Nr of vevent components {len(components)}')
         for component in components:
@@ -277,33 +736,111 @@ class CalendarHandler:
                 chronos_event.calDAV = calEvent
 
                 # Only handle public events and those not conataining exclude tags
-                is_invalid_event = chronos_event.is_confidential or chronos_event.is_excluded or chronos_event.date_out_of_range
-                if is_invalid_event:
+                reason = self._filter_reason(chronos_event)
+                if reason is not None:
                     logger.info(f"Skipping further ical parsing on confidential or excluded event: {chronos_event.uid} | Source: {self.cal_name}")
+                    self._count_filtered(reason)
                     continue
 
                 chronos_event.populate_from_vcal_object()
                 self.events_data[chronos_event.key] = chronos_event
+                self._href_keys.setdefault(href, set()).add(chronos_event.key)
+
+        # only resources with synced events are stored. confidential data never reaches the state store
+        if self.state is not None and href in self._href_keys:
+            self._resource_changes[href] = raw
+
+    def _read_chronos_event(self, calEvent: caldav.Event, href: str) -> None:
+        """read events created by chronos from their raw properties. other resources are dropped unparsed"""
+        if not CHRONOS_EVENT_PATTERN.search(calEvent.data):
+            return
+
+        for block in IcsStream(calEvent.data.splitlines()).events():
+            chronos_event = ChronosEvent(self)
+            chronos_event.calDAV = calEvent
+            chronos_event.populate_from_properties(event_properties(block))
+            if not chronos_event.is_chronos_origin:
+                continue
+
+            reason = self._filter_reason(chronos_event)
+            if reason is not None:
+                self._count_filtered(reason)
+                continue
+
+            self.events_data[chronos_event.key] = chronos_event
+            self._href_keys.setdefault(href, set()).add(chronos_event.key)
+
+        if self.state is not None and href in self._href_keys:
+            self._resource_changes[href] = calEvent.data
 
     def search_events_by_tags(self, tags: list) -> dict:
         """search read events created by chronos with given tags
         #TODO: Check newer caldav version for direct search
         """
-        found = {}
-        for key, event in self.events_data.items():
-            if set(tags).issubset(event.categories) and event.is_chronos_origin:
-                found[key] = event
-        return found
+        self._ensure_index()
+        if not tags:
+            keys = set().union(*self._calid_index.values())
+        else:
+            keys = set.intersection(*(self._tag_index.get(tag, set()) for tag in tags))
+        return {key: self.events_data[key] for key in keys}
 
     def search_events_by_calid(self, calid: str) -> dict[str, ChronosEvent]:
         """search read events created by chronos with given calendar id"""
-        found = {}
+        self._ensure_index()
+        return dict(self._calid_index.get(calid, {}))
+
+    def add_event(self, event: ChronosEvent) -> None:
+        """add an event (e.g. newly created on the calendar) and keep the lookup indexes up to date"""
+        key = event.key
+        if key in self.events_data:
+            self.remove_event(key)
+        self.events_data[key] = event
+        if event.calDAV is not None:
+            self._href_keys.setdefault(str(event.calDAV.url.canonical()), set()).add(key)
+        if self._calid_index is not None:
+            self._index_event(key, event)
+
+    def remove_event(self, key) -> None:
+        """remove an event (e.g. deleted from the calendar) and keep the lookup indexes up to date"""
+        event = self.events_data.pop(key, None)
+        if event is None:
+            return
+        if event.calDAV is not None:
+            href = str(event.calDAV.url.canonical())
+            keys = self._href_keys.get(href)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._href_keys[href]
+        if self._calid_index is None:
+            return
+        calid_events = self._calid_index.get(event.cal_id)
+        if calid_events is not None:
+            calid_events.pop(key, None)
+        for keys in self._tag_index.values():
+            keys.discard(key)
+
+    def _invalidate_index(self) -> None:
+        self._calid_index = None
+        self._tag_index = {}
+
+    def _ensure_index(self) -> None:
+        """build lookup indexes for events created by chronos once per read"""
+        if self._calid_index is not None:
+            return
+        self._calid_index = {}
+        self._tag_index = {}
         for key, event in self.events_data.items():
-            if calid == event.cal_id and event.is_chronos_origin:
-                found[key] = event
+            self._index_event(key, event)
 
-        return found
+    def _index_event(self, key, event: ChronosEvent) -> None:
+        if not event.is_chronos_origin:
+            return
+        self._calid_index.setdefault(event.cal_id, {})[key] = event
+        for tag in event.categories:
+            self._tag_index.setdefault(tag, set()).add(key)
 
     def close_connection(self) -> None:
-        if self.client is not None:
-            self.client.close()
+        """release the connection. the shared session itself is closed by its registry"""
+        self.session = None
+        self.client = None
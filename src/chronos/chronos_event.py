@@ -2,13 +2,11 @@
 
 # python lib
 from hashlib import md5
-from string import Template
 from typing import TYPE_CHECKING
 import datetime as dt
 import logging
 import regex
 import uuid
-import zoneinfo
 
 # external libs
 from icalendar import vDDDTypes as icalDate
@@ -18,6 +16,7 @@ import icalendar
 
 # own code
 from chronos import helpers
+from chronos.ics_reader import parse_date_property, parse_event
 
 # typing workaround to prevent circular import (see https://docs.python.org/3/library/typing.html#typing.TYPE_CHECKING)
 if TYPE_CHECKING:
@@ -26,8 +25,151 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# prefix added to titles by chronos or others, e.g. "Source | Title"
+TITLE_PREFIX_PATTERN = regex.compile(r"^([^\|]*\|)")
+NON_ASCII_PATTERN = regex.compile(r"[^\x00-\x7F]+")
+
+
+class EventRecord:
+    """
+    iCal fields of an event extracted in one pass.
+    events keep their record until the underlying component is changed (see ChronosEvent.invalidate)
+    """
+
+    __slots__ = (
+        "title",
+        "categories",
+        "status",
+        "event_class",
+        "last_modified",
+        "has_last_modified",
+        "origin",
+        "cal_id",
+        "source_uid",
+        "content_hash",
+        "excluded",
+    )
+
+    def __init__(self, component: icalendar.Event):
+        self.title: str = clear_title(component.get("summary")) if component else "undefined"
+
+        _cats = component.get("categories")
+        self.categories: list = _cats.to_ical().decode().split(",") if _cats else []
+
+        self.status = component.get("status")
+        self.event_class = component.get("class")
+
+        _mod = component.get("last-modified")
+        _stamp = _mod if _mod else component.get("dtstamp")
+        self.has_last_modified: bool = True if _mod else False
+        self.last_modified: dt.datetime | None = None
+        if _stamp is not None:
+            self.last_modified = _stamp.dt
+            if self.last_modified.tzinfo is None:
+                self.last_modified = self.last_modified.astimezone(helpers.UTC)
+
+        self.origin = component.get("X-ILSC-ORIGIN")
+        self.cal_id = component.get("X-ILSC-CALID")
+        self.source_uid = component.get("X-ILSC-UID")
+        self.content_hash = component.get("X-ILSC-HASH")
+        # decided by the exclusion rules of the source on first use (see ChronosEvent.is_excluded)
+        self.excluded: bool | None = None
+
+    @classmethod
+    def from_properties(cls, properties: dict[str, tuple[str, str]]) -> "EventRecord":
+        """record from raw properties (see ics_reader.event_properties) without parsing the event"""
+        record = cls.__new__(cls)
+        record.title = clear_title(_text_property(properties, "SUMMARY"))
+
+        _cats = properties.get("CATEGORIES")
+        record.categories = _cats[1].split(",") if _cats and _cats[1] else []
+
+        record.status = _text_property(properties, "STATUS")
+        record.event_class = _text_property(properties, "CLASS")
+
+        _mod = properties.get("LAST-MODIFIED")
+        _stamp = _mod if _mod else properties.get("DTSTAMP")
+        record.has_last_modified = True if _mod else False
+        record.last_modified = None
+        if _stamp is not None:
+            record.last_modified = parse_date_property(*_stamp)
+            if record.last_modified.tzinfo is None:
+                record.last_modified = record.last_modified.astimezone(helpers.UTC)
+
+        record.origin = _text_property(properties, "X-ILSC-ORIGIN")
+        record.cal_id = _text_property(properties, "X-ILSC-CALID")
+        record.source_uid = _text_property(properties, "X-ILSC-UID")
+        record.content_hash = _text_property(properties, "X-ILSC-HASH")
+        record.excluded = None
+        return record
+
+
+class EventData:
+    """
+    compact result of parsing a VEVENT, small enough to be sent from worker processes (see parse_event_blocks).
+    errors in dates are kept and raised when the event gets populated, as filtered events are never populated
+    """
+
+    __slots__ = ("uid", "record", "created", "dt_start", "dt_end", "date", "description", "location", "error")
+
+    def __init__(self, component: icalendar.Event):
+        self.uid = str(component.get("uid"))
+        self.record = EventRecord(component)
+        self.description: icalendar.vText | None = component.get("description")
+        self.location: icalendar.vText | None = component.get("location")
+
+        self.created = self.dt_start = self.dt_end = self.date = None
+        self.error: str | None = None
+        try:
+            self.created = helpers.convert_to_date_or_utc_datetime(component.get("dtstamp").dt)
+            self.dt_start = helpers.convert_to_date_or_utc_datetime(component.get("dtstart").dt)
+            self.dt_end = helpers.convert_to_date_or_utc_datetime(component.get("dtend").dt)
+            _date = component.get("dtstart").dt
+            self.date = _date.date() if isinstance(_date, dt.datetime) else _date
+        except Exception as ex:
+            self.error = str(ex)
+
+
+def parse_event_blocks(blocks: list[list[str]]) -> list[EventData]:
+    """parse VEVENT blocks of an ICS file. runs in worker processes"""
+    return [EventData(parse_event(block)) for block in blocks]
+
+
+def _text_property(properties: dict[str, tuple[str, str]], name: str) -> icalendar.vText | None:
+    if name not in properties:
+        return None
+    return icalendar.vText(icalendar.vText.from_ical(properties[name][1]))
+
+
+def clear_title(title: icalendar.vText) -> str:
+    """
+    Search for first occurance of any Prefix and replace
+    Assumes that someone or thing added prefixes
+    """
+    # TODO: collect all possible prefixes and match against them
+    if title:
+        return TITLE_PREFIX_PATTERN.sub("", title.to_ical().decode()).strip()
+    return "N/A"
+
 
 class ChronosEvent:
+    __slots__ = (
+        "source",
+        "uid",
+        "created",
+        "date",
+        "dt_start",
+        "dt_end",
+        "description",
+        "location",
+        "calDAV",
+        "_ics_event",
+        "_record",
+        "_properties",
+        "_component",
+        "_data",
+    )
+
     def __init__(self, source: "CalendarHandler"):
         self.source: "CalendarHandler" = source
 
@@ -41,6 +183,13 @@ class ChronosEvent:
 
         self.calDAV: caldav.Event | None = None
         self._ics_event: icalendar.Event | None = None
+        self._record: EventRecord | None = None
+        # raw properties of events read without parsing (see populate_from_properties)
+        self._properties: dict[str, tuple[str, str]] | None = None
+        # VEVENT of the calDAV resource. looked up once until invalidated
+        self._component: icalendar.Event | None = None
+        # parsed by a worker process instead of keeping the iCal component (ICS files)
+        self._data: EventData | None = None
 
     def __repr__(self):
         return f"ChronosEvent - {self.date} | {self.title}"
@@ -52,64 +201,87 @@ class ChronosEvent:
 
     @property
     def title(self):
-        return self._clear_title(self.ical.get("summary")) if self.ical else "undefined"
+        return self.record.title
 
     @property
     def safe_title(self):
-        return regex.sub(r"[^\x00-\x7F]+", "", self.title)
+        return NON_ASCII_PATTERN.sub("", self.title)
 
     @property
     def ical(self) -> caldav.Event:
         if self.calDAV is not None:
-            return self.calDAV.icalendar_component
+            if self._component is None:
+                self._component = self.calDAV.icalendar_component
+            return self._component
         if self._ics_event is not None:
             return self._ics_event
         message = "neither self.calDAV.icalendar_component (for calendars from CalDAV input)"
         message += " nor self._ics_event (for calendars from ICS file input) is given"
         raise ValueError(message)
 
+    @property
+    def record(self) -> EventRecord:
+        """parsed iCal fields. extracted on first access"""
+        if self._record is None:
+            if self._properties is not None:
+                self._record = EventRecord.from_properties(self._properties)
+            elif self._data is not None:
+                self._record = self._data.record
+            else:
+                self._record = EventRecord(self.ical)
+        return self._record
+
+    def invalidate(self) -> None:
+        """drop parsed iCal fields after the underlying component was changed"""
+        self._record = None
+        self._properties = None
+        self._component = None
+
     @property
     def is_chronos_origin(self) -> bool:
         """check if chronos was creator of this event"""
-        return self.origin == self.source.app_config.get("app", "app_id")
+        return self.origin == self.source.app_config.runtime.app_id
 
     @property
     def remote_changed(self) -> bool:
         """
         ' check if event was changed remotely in iCAL
         """
-        _mod = self.ical.get("last-modified")
-        return True if _mod else False
+        return self.record.has_last_modified
 
     @property
     def last_modified(self) -> dt.datetime:
         """return last modification date. if event never was modified the creation date is provided"""
-        _mod = self.ical.get("last-modified")
-        result: dt.datetime = _mod.dt if _mod else self.ical.get("dtstamp").dt
-        if result.tzinfo is None:
-            result = result.astimezone(zoneinfo.ZoneInfo("UTC"))
+        result = self.record.last_modified
+        if result is None:
+            raise ValueError("neither LAST-MODIFIED nor DTSTAMP given")
         return result
 
     @property
     def origin(self) -> str:
         """returns None if not set"""
-        return self.ical.get("X-ILSC-ORIGIN")
+        return self.record.origin
 
     @property
     def cal_id(self) -> str:
-        return self.ical.get("X-ILSC-CALID")
+        return self.record.cal_id
+
+    @property
+    def content_hash(self) -> str | None:
+        """hash of the rendered source event stored on target events. returns None if not set"""
+        return self.record.content_hash
 
     @property
     def source_uid(self) -> str:
         """returns None if not set"""
-        return self.ical.get("X-ILSC-UID")
+        return self.record.source_uid
 
     @property
     def prefixed_title(self) -> str:
         """return title prefixed with string defined in calender config"""
         if self.source.title_prefix and self.source.sanitize_icons_tgt:
-            _prefix_format = self.source.app_config.get("calendars", "prefix_format")
-            _pre = Template(_prefix_format).substitute(icons=self.icons, prefix=self.source.title_prefix).strip()
+            _prefix_template = self.source.app_config.runtime.prefix_template
+            _pre = _prefix_template.substitute(icons=self.icons, prefix=self.source.title_prefix).strip()
             return f"{_pre} | {self.title}"
         if self.source.title_prefix:
             return f"{self.source.title_prefix} | {self.title}"
@@ -119,11 +291,7 @@ class ChronosEvent:
     @property
     def categories(self) -> list:
         """fetch categories from ical object and return as list"""
-        _cats = self.ical.get("categories")
-        if _cats:
-            _cats = _cats.to_ical().decode().split(",")
-            return _cats
-        return []
+        return self.record.categories
 
     @property
     def is_all_day(self):
@@ -155,7 +323,7 @@ class ChronosEvent:
             "CANCELLED"           ;Indicates event is canceled
             returns True if satus is TENTATIVE
         """
-        return True if (self.ical.get("status") == "TENTATIVE") or (self._is_planned_from_title) else False
+        return True if (self.record.status == "TENTATIVE") or (self._is_planned_from_title) else False
 
     @property
     def _is_planned_from_title(self) -> bool:
@@ -173,11 +341,11 @@ class ChronosEvent:
             "CANCELLED"           ;Indicates event is canceled
             returns True if satus is CANCELLED
         """
-        return True if self.ical.get("status") == "CANCELLED" else False
+        return True if self.record.status == "CANCELLED" else False
 
     @property
     def is_confidential(self) -> bool:
-        class_content = self.ical.get("class")
+        class_content = self.record.event_class
         # "CLASS" entry being not set means that it is "PUBLIC" (as it is the default value)
         is_public = class_content is None or class_content == "PUBLIC"
         confidential = not is_public
@@ -185,24 +353,23 @@ class ChronosEvent:
 
     @property
     def is_excluded(self) -> bool:
-        set_of_event_categories = set(map(lambda x: x.lower(), self.categories))
-        set_of_excluded_tags = set(map(lambda x: x.lower(), self.source.tags_excluded))
-        do_exclude_by_tag = not (set_of_excluded_tags.isdisjoint(set_of_event_categories))
-
-        do_exclude_by_string_in_summary = False
-        for the_string in self.source.exclude_event_by_strings_in_summary:
-            if the_string.lower() in self.title.lower():
-                do_exclude_by_string_in_summary = True
-
-        do_exclude = do_exclude_by_tag or do_exclude_by_string_in_summary
-        return do_exclude
+        """check excluded tags and strings in summary of the source. decided once per record"""
+        record = self.record
+        if record.excluded is None:
+            record.excluded = self.source.exclusion_matcher.is_excluded(record.categories, record.title)
+        return record.excluded
 
     @property
     def status(self):
-        return self.ical.get("status")
+        return self.record.status
+
+    @property
+    def is_hidden(self) -> bool:
+        """true if the event must not appear on the target calendar"""
+        return (self.source.ignore_planned and self.is_planned) or self.is_confidential or self.is_excluded
 
     def _make_date(self, date_or_datetime: dt.date | dt.datetime, force_time: str) -> dt.date | dt.datetime:
-        app_timezone = zoneinfo.ZoneInfo(self.source.app_config.get("app", "timezone"))
+        app_timezone = self.source.app_config.runtime.timezone
 
         # allday:
         if self.is_all_day:
@@ -242,19 +409,30 @@ class ChronosEvent:
     def date_out_of_range(self) -> bool:
         try:
             target = self._get_ical_start_date()
-            today = dt.date.today()
-            delta = (target - today).days
-            range_max = self.source.app_config.get("calendars", "range_max")
-            # Reduce by two days to bypass assumed day drift in Calendar selection
-            out_of_range = delta > (range_max - 1)
+            out_of_range = target > self.source.run_context.last_start_date
             return out_of_range
         except Exception:
             logger.critical("Could not determine day distance")
         return True
 
     @property
-    def md5_string(self):
-        return f"{self.date}_{self.safe_title}_{self.description}".encode("utf-8")
+    def md5_string(self) -> bytes:
+        """canonical representation of the event as rendered onto the target calendar"""
+        description = ""
+        if self.source.ignore_descriptions is False and self.description:
+            description = self.sanitize_description()
+        location = self.source.default_location if self.location is None else self.location
+        fields = (
+            self.prefixed_title,
+            description,
+            self.date_start,
+            self.date_end,
+            ",".join(self.combine_categories(self.source.tags)),
+            location,
+            self.status,
+            self.source.color,
+        )
+        return "\x1f".join("" if field is None else str(field) for field in fields).encode("utf-8")
 
     @property
     def md5(self):
@@ -269,6 +447,9 @@ class ChronosEvent:
 
     def populate_from_vcal_object(self) -> None:
         # TODO: ensure UID exists (at least it should )
+        if self._data is not None:
+            self._populate_from_data()
+            return
         try:
             self.uid = str(self.ical.get("uid"))
             if self.is_confidential or self.is_excluded:
@@ -291,24 +472,57 @@ class ChronosEvent:
             logger.error(f"Could not process Event UID: {self.uid} | Source: {self.source.cal_name} | Reason: - {ex}")
             raise ex
 
+    def _populate_from_data(self) -> None:
+        data = self._data
+        self.uid = data.uid
+        if self.is_confidential or self.is_excluded:
+            logger.info(f"Skipping further ical parsing on confidential or excluded event: {self.uid} | Source: {self.source.cal_name}")
+            return
+        if data.error is not None:
+            logger.error(f"Could not process Event UID: {self.uid} | Source: {self.source.cal_name} | Reason: - {data.error}")
+            raise ValueError(data.error)
+
+        self.created = data.created
+        self.dt_start = data.dt_start
+        self.dt_end = data.dt_end
+        self.date = data.date
+        self.description = data.description
+        self.location = data.location
+
+    def populate_from_properties(self, properties: dict[str, tuple[str, str]]) -> None:
+        """populate from raw properties. the iCal data itself is only parsed once the event gets changed"""
+        self._properties = properties
+        self._record = None
+        try:
+            self.uid = str(_text_property(properties, "UID"))
+            self.created = helpers.convert_to_date_or_utc_datetime(parse_date_property(*properties["DTSTAMP"]))
+            self.dt_start = helpers.convert_to_date_or_utc_datetime(parse_date_property(*properties["DTSTART"]))
+            self.dt_end = helpers.convert_to_date_or_utc_datetime(parse_date_property(*properties["DTEND"]))
+
+            self.date = self._get_ical_start_date()
+
+            self.description = _text_property(properties, "DESCRIPTION")
+            self.location = _text_property(properties, "LOCATION")
+        except Exception as ex:
+            logger.error(f"Could not process Event UID: {self.uid} | Source: {self.source.cal_name} | Reason: - {ex}")
+            raise ex
+
     def _get_ical_start_date(self) -> dt.date:
-        _date = self.ical.get("dtstart").dt
+        if self._properties is not None:
+            _date = parse_date_property(*self._properties["DTSTART"])
+        elif self._data is not None:
+            if self._data.date is None:
+                raise ValueError(self._data.error)
+            return self._data.date
+        else:
+            _date = self.ical.get("dtstart").dt
         if isinstance(_date, dt.datetime):
             return _date.date()
         return _date
 
-    def _clear_title(self, title: icalendar.vText) -> str:
-        """
-        Search for first occurance of any Prefix and replace
-        Assumes that someone or thing added prefixes
-        """
-        # TODO: collect all possible prefixes and match against them
-        if title:
-            return regex.sub(r"^([^\|]*\|)", "", title.to_ical().decode(), count=0, flags=0).strip()
-        return "N/A"
-
     def combine_categories(self, first: list) -> list:
-        return first.copy() + list(set(self.categories) - set(first))
+        """given categories first, then the remaining event categories sorted, so rendering and hash are stable"""
+        return first.copy() + sorted(set(self.categories) - set(first))
 
     def sanitize_description(self) -> icalendar.vText:
         _desc = self.description.to_ical()
@@ -317,19 +531,13 @@ class ChronosEvent:
         except Exception:
             _desc = str(_desc)
 
-        _desc = helpers.remove_html_from_description(_desc)
-
-        nocmt = helpers.remove_multi_line_comments(_desc)
-        nocmt = helpers.remove_single_line_comments(nocmt)
-        nocmt = helpers.strip_newlines(nocmt)
-
-        result = icalendar.vText(nocmt)
+        result = icalendar.vText(helpers.sanitize_description(_desc))
         return result
 
     def create_ical_event(self) -> icalendar.Event:
         new_event = icalendar.Event()
 
-        app_timezone = zoneinfo.ZoneInfo(self.source.app_config.get("app", "timezone"))
+        app_timezone = self.source.app_config.runtime.timezone
         _now = dt.datetime.now().astimezone(app_timezone)
 
         # set random uuid to support getting arround nextcloud deleting problem
@@ -358,46 +566,49 @@ class ChronosEvent:
         ####
         # CUSTOM PROPERTIES
         # TODO: Check existence after updating with HIDs (works on rainlendar, android phone [google calendar, jorte]
-        new_event.add("X-ILSC-ORIGIN", self.source.app_config.get("app", "app_id"))
+        new_event.add("X-ILSC-ORIGIN", self.source.app_config.runtime.app_id)
         new_event.add("X-ILSC-CREATED", str(_now))
         new_event.add("X-ILSC-CALID", self.source.chronos_id)
         new_event.add("X-ILSC-UID", self.key)
+        new_event.add("X-ILSC-HASH", self.md5)
 
         return new_event
 
     def update_calDaV_event(self, src_event):
         """update data from given event"""
 
-        self.calDAV.icalendar_component["summary"] = src_event.prefixed_title
+        # all changes go to the same parsed component. it is serialized once by save
+        component = self.calDAV.icalendar_component
+        component["summary"] = icalendar.vText(src_event.prefixed_title)
 
-        if src_event.description is None and "description" in self.calDAV.vobject_instance.vevent.contents.keys():
+        if src_event.description is None and "description" in component:
             # remove description from VEVENT cause it should not be there
-            self.calDAV.vobject_instance.vevent.remove(self.calDAV.vobject_instance.vevent.description)
+            del component["description"]
 
         if src_event.source.ignore_descriptions is False and src_event.description:
             # add description to VEVENT
-            if "description" not in self.calDAV.vobject_instance.vevent.contents.keys():
-                self.calDAV.vobject_instance.vevent.add("description")
-            self.calDAV.vobject_instance.vevent.description.value = src_event.sanitize_description()
+            component["description"] = src_event.sanitize_description()
 
         if src_event.location is None:
-            self.calDAV.icalendar_component["location"] = src_event.source.default_location
+            component["location"] = src_event.source.default_location
         else:
-            self.calDAV.icalendar_component["location"] = src_event.location
+            component["location"] = src_event.location
 
-        self.calDAV.icalendar_component["categories"] = vCategory(src_event.combine_categories(src_event.source.tags))
-        self.calDAV.icalendar_component["dtstart"] = icalDate(src_event.date_start)
-        self.calDAV.icalendar_component["dtend"] = icalDate(src_event.date_end)
+        component["categories"] = vCategory(src_event.combine_categories(src_event.source.tags))
+        component["dtstart"] = icalDate(src_event.date_start)
+        component["dtend"] = icalDate(src_event.date_end)
         # add/update last modified parameter cause nextcloud does not
-        self.calDAV.icalendar_component["last-modified"] = icalDate(dt.datetime.now())
+        component["last-modified"] = icalDate(dt.datetime.now())
 
-        self.calDAV.icalendar_component["status"] = src_event.status
-        if (src_event.source.ignore_planned and src_event.is_planned) or src_event.is_confidential or src_event.is_excluded:
+        component["status"] = src_event.status
+        component["X-ILSC-HASH"] = src_event.md5
+        if src_event.is_hidden:
             # DELETE rather than save
             self.calDAV.delete()
             logger.success(f'Deleted {self.date} | {self.safe_title} out of the row in "{src_event.source.cal_name}".')
         else:
             self.calDAV.save()
+        self.invalidate()
         return self
 
     def set_title_icons(self, sep=" | "):
@@ -405,6 +616,7 @@ class ChronosEvent:
             if self.icons:
                 _new_title = icalendar.vText(f"{self.icons}{sep}{self.title}")
                 self.calDAV.icalendar_component["summary"] = _new_title
+                self.invalidate()
                 logger.success(f"Event icons set for {self.date} | {self.safe_title}")
                 return True
             # return False
@@ -417,7 +629,8 @@ class ChronosEvent:
         icons = set(self.categories).intersection(set(self.source.icons))
         icon_str = ""
         if icons:
-            for icon in icons:
+            # sorted, as set order changes with the hash seed of the process
+            for icon in sorted(icons):
                 icon_str += self.source.icons[icon]
         return icon_str
 
@@ -426,6 +639,7 @@ class ChronosEvent:
             if self.title.startswith("?"):  # or self.title.endswith("?"):
                 self.calDAV.icalendar_component["status"] = "TENTATIVE"
                 self.calDAV.icalendar_component["summary"] = icalendar.vText(self.calDAV.icalendar_component["summary"].lstrip("?").strip())
+                self.invalidate()
                 logger.success(f"Set correct visibility for {self.date} | {self.safe_title}")
                 return True
         except Exception as ex:
@@ -437,6 +651,7 @@ class ChronosEvent:
         try:
             self.calDAV.save()
             self.calDAV.load()
+            self.invalidate()
             logger.success(f"Updated {self.date} | {self.safe_title}")
         except Exception as ex:
             logger.error(f"Could not update for {self.date} | {self.safe_title} - {ex}")
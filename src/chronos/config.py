@@ -6,7 +6,7 @@ Created on 25.02.2022
 @author: Input
 """
 
-__all__ = ["CommandLine", "Config"]
+__all__ = ["CommandLine", "Config", "RuntimeConfig"]
 
 import argparse
 import configparser
@@ -14,9 +14,11 @@ import sys
 import ast
 import pathlib as pl
 import logging
+import zoneinfo
 
 from collections import OrderedDict
 from copy import deepcopy
+from string import Template
 
 
 logger = logging.getLogger(__name__)
@@ -30,6 +32,18 @@ CommandLine.add_argument(
     help="Specify path to the configuration file",
     default="./config/app.cfg",
 )
+CommandLine.add_argument(
+    "--dry-run",
+    action="store_true",
+    help="Read all calendars, report the planned changes and exit without writing to any calendar",
+)
+CommandLine.add_argument(
+    "--plan-file",
+    type=pl.Path,
+    action="store",
+    help="Write the sync plan of every run as JSON to this file",
+    default=None,
+)
 ###Class definitions
 
 
@@ -228,6 +242,28 @@ class ConfigPath:
             self.val = deepcopy(self._default)
 
 
+class RuntimeConfig:
+    """
+    immutable view of the values read on hot paths, resolved once after the configuration was read
+    """
+
+    __slots__ = ("timezone", "app_id", "range_min", "range_max", "prefix_template")
+
+    def __init__(self, config: "Config"):
+        set_value = super().__setattr__
+        set_value("timezone", zoneinfo.ZoneInfo(config.get("app", "timezone")))
+        set_value("app_id", config.get("app", "app_id"))
+        set_value("range_min", config.get("calendars", "range_min"))
+        set_value("range_max", config.get("calendars", "range_max"))
+        set_value("prefix_template", Template(config.get("calendars", "prefix_format")))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'RuntimeConfig is read only: "{name}"')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'RuntimeConfig is read only: "{name}"')
+
+
 class Config:
     """
     app configuration class
@@ -246,6 +282,8 @@ class Config:
             "app",
             "calendars",
             "log",
+            "metrics",
+            "webhook",
             "debug",
         ]
         # Parsed files
@@ -259,6 +297,17 @@ class Config:
             # run gspread and caldav parser every n-th hour of day
             ConfigValue("appcron", int, value=None, default=4),
             ConfigValue("app_id", default="Chronos"),
+            # number of calendars read in parallel
+            ConfigValue("read_workers", int, default=4),
+            # number of concurrent write requests to the target calendar
+            ConfigValue("write_workers", int, default=8),
+            # timeout in seconds for a single request to a calendar server
+            ConfigValue("request_timeout", int, default=60),
+            # seconds a connection and its calendar discovery are reused before being renewed
+            ConfigValue("connection_ttl", int, default=3600),
+            # skip datacron ticks for calendars without changes, doubling the interval up to poll_interval_max seconds
+            ConfigValue("adaptive_polling", bool, default=True),
+            ConfigValue("poll_interval_max", int, default=3600),
         )
 
         # Section [calendars]
@@ -269,6 +318,16 @@ class Config:
             ConfigValue("range_min", int, default=0),
             ConfigValue("range_max", int, default=365),
             ConfigValue("delete_on_target", bool, default=True),
+            # only fetch changes since the last read (ctag / sync-token)
+            ConfigValue("incremental_sync", bool, default=True),
+            # keep sync state between runs in a local database
+            ConfigValue("persist_state", bool, default=True),
+            ConfigValue("state_filename", default="state.sqlite"),
+            ConfigPath("state_file"),
+            # worker processes parsing large ICS files (0 or 1 parses in the reading thread)
+            ConfigValue("parse_processes", int, default=0),
+            # events per chunk sent to a worker. files with less than two chunks are parsed in the reading thread
+            ConfigValue("parse_chunk_size", int, default=500),
             ConfigValue("prefix_format", default="$icons $prefix"),
         )
 
@@ -283,6 +342,26 @@ class Config:
             ConfigValue("backups", int, default=7),
             ConfigValue("show_tracebacks", bool, default=False),
         )
+        # Section [metrics]
+        self.metrics = ConfigSection(
+            ConfigValue("enabled", bool, default=False),
+            ConfigPath("path", default="./logs/", exists=True, create=False),
+            # set a filename to None to skip the format
+            ConfigValue("json_filename", default="metrics.json"),
+            ConfigPath("json_file"),
+            ConfigValue("prometheus_filename", default="chronos.prom"),
+            ConfigPath("prometheus_file"),
+        )
+        # Section [webhook]
+        self.webhook = ConfigSection(
+            ConfigValue("enabled", bool, default=False),
+            ConfigValue("host", default="127.0.0.1"),
+            ConfigValue("port", int, default=8085),
+            # expected as "Authorization: Bearer <token>" or ?token=. None accepts every request
+            ConfigValue("token", default=None),
+            # seconds to wait for further edits before syncing the notified calendar
+            ConfigValue("debounce", int, default=10),
+        )
         # Section [debug]
         self.debug = ConfigSection(
             ConfigValue("remote", bool, default=False),
@@ -299,6 +378,7 @@ class Config:
         self.appCL = CommandLine.parse_args()
         self._read_commandline_config()
         self._configure_file_paths()
+        self.runtime = RuntimeConfig(self)
 
         logger.info("Configuration successful")
 
@@ -352,9 +432,17 @@ class Config:
         calendar_filename = self.get("calendars", "path").joinpath(self.get("calendars", "filename"))
         self.calendars.update("file", calendar_filename)
 
+        state_filename = self.get("calendars", "path").joinpath(self.get("calendars", "state_filename"))
+        self.calendars.update("state_file", state_filename)
+
         log_filename = self.get("log", "path").joinpath(self.get("log", "filename"))
         self.log.update("file", log_filename)
 
+        for metrics_format in ("json", "prometheus"):
+            metrics_filename = self.get("metrics", f"{metrics_format}_filename")
+            if metrics_filename is not None:
+                self.metrics.update(f"{metrics_format}_file", self.get("metrics", "path").joinpath(metrics_filename))
+
     def _read_commandline_config(self):
         if self.appCL.config:
             self.appCL.config = pl.Path(self.appCL.config).resolve()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+# python lib
+import logging
+import threading
+import time
+
+# external libs
+import caldav
+
+# own code
+from chronos.metrics import RunMetrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class DAVSession:
+    """DAV client of one account with cached principal and calendar discovery"""
+
+    def __init__(self, url: str, username: str, password: str, timeout: int, pool_size: int, on_response=None):
+        self.url = url
+        self.username = username
+        self.password = password
+        self.created = time.monotonic()
+
+        self.client = caldav.DAVClient(url, username=username, password=password, timeout=timeout)
+        self._size_connection_pool(pool_size)
+        if on_response is not None:
+            self.client.session.hooks["response"].append(on_response)
+
+        self._lock = threading.Lock()
+        self._principal: caldav.Principal | None = None
+        self._calendars: list[caldav.Calendar] | None = None
+
+    def _size_connection_pool(self, size: int) -> None:
+        """keep as many connections alive as requests may be sent concurrently"""
+        adapter = self.client.session.get_adapter(self.url)
+        if getattr(adapter, "_pool_maxsize", 0) >= size:
+            return
+        for prefix in ("http://", "https://"):
+            self.client.session.mount(prefix, type(adapter)(pool_maxsize=size))
+
+    @property
+    def principal(self) -> caldav.Principal:
+        with self._lock:
+            if self._principal is None:
+                self._principal = self.client.principal()
+            return self._principal
+
+    def calendars(self, refresh: bool = False) -> list[caldav.Calendar]:
+        """calendars of the principal. discovered once per session unless refresh is requested"""
+        principal = self.principal
+        with self._lock:
+            if self._calendars is None or refresh:
+                self._calendars = principal.calendars()
+            return self._calendars
+
+    def is_expired(self, ttl: int) -> bool:
+        return time.monotonic() - self.created > ttl
+
+    def close(self) -> None:
+        try:
+            self.client.close()
+        except Exception as ex:
+            logger.error(f"Closing connection to {self.url} failed. Reason: {ex}")
+
+
+class SessionRegistry:
+    """
+    shares DAV sessions between calendar handlers and runs, keyed by (server url, user).
+    sessions are renewed after ttl seconds
+    """
+
+    def __init__(self, ttl: int, timeout: int, pool_size: int):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        self._lock = threading.Lock()
+        self._sessions: dict[tuple[str, str], DAVSession] = {}
+        # HTTP traffic of all sessions is counted into the metrics of the current run
+        self.metrics: RunMetrics | None = None
+
+    def _record_response(self, response, *args, **kwargs) -> None:
+        metrics = self.metrics
+        if metrics is None:
+            return
+        body = response.request.body
+        bytes_sent = len(body) if isinstance(body, (bytes, str)) else 0
+        metrics.record_request(response.request.method, response.status_code, bytes_sent, len(response.content or b""))
+
+    def get(self, url: str, username: str, password: str) -> DAVSession:
+        key = (url, username)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and session.password != password:
+                # do not close, other handlers may still use it
+                session = None
+            if session is None:
+                logger.debug(f"Opening DAV session for {username} on {url}")
+                session = DAVSession(url, username, password, self.timeout, self.pool_size, self._record_response)
+                self._sessions[key] = session
+            return session
+
+    def expire(self) -> None:
+        """close sessions older than ttl. must not be called while handlers are reading or writing"""
+        with self._lock:
+            for key, session in list(self._sessions.items()):
+                if session.is_expired(self.ttl):
+                    logger.debug(f"Closing expired DAV session for {session.username} on {session.url}")
+                    session.close()
+                    del self._sessions[key]
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+# python lib
+from typing import Iterable
+import regex
+
+
+class ExclusionMatcher:
+    """
+    exclusion rules of a calendar compiled once: excluded tags as a set and strings in summaries as a single alternation.
+    both are compared case insensitive
+    """
+
+    def __init__(self, tags: Iterable[str], strings_in_summary: Iterable[str]):
+        self.tags = frozenset(tag.lower() for tag in tags)
+        strings = sorted({string.lower() for string in strings_in_summary}, key=len, reverse=True)
+        self.pattern = regex.compile("|".join(map(regex.escape, strings))) if strings else None
+
+    def is_excluded(self, categories: Iterable[str], title: str) -> bool:
+        if self.tags and not self.tags.isdisjoint(category.lower() for category in categories):
+            return True
+        return self.pattern is not None and self.pattern.search(title.lower()) is not None
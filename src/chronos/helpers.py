@@ -1,16 +1,23 @@
 # -*- coding: utf-8 -*-
 
+from functools import lru_cache
 import datetime as dt
 from html.parser import HTMLParser
 from logging import Logger
 import zoneinfo
 
-from bs4 import BeautifulSoup
 import regex
 
 from chronos.config import Config
 
 
+MULTI_LINE_COMMENT_PATTERN = regex.compile(r"(?:^\s*#{3}|(?<=\\n)\s*#{3})(?:\\n)?[^#]{3}.*?(?:#{3}\\n|#{3}$)")
+SINGLE_LINE_COMMENT_PATTERN = regex.compile(r"((?:^\s*#|(?<=\\n)\s*#).*?(?:[^\\]\\n|$))")
+SURPLUS_NEWLINES_PATTERN = regex.compile(r"(^(?:\s*\\n){1,}|(?<=(?:\s*\\n){2})(?:\s*\\n)*)|((?:\s*\\n)*$)")
+
+UTC = zoneinfo.ZoneInfo("UTC")
+
+
 def convert_to_date_or_timezone_datetime(date_or_datetime: dt.date | dt.datetime, time_zone: zoneinfo.ZoneInfo) -> dt.date | dt.datetime:
     """convert to given timezone if the type is `datetime` else leave it as date."""
 
@@ -29,7 +36,7 @@ def convert_to_date_or_utc_datetime(
     """convert to UTC timezone if the type is `datetime` else leave it as date."""
 
     if type(date_or_datetime) is dt.datetime:
-        result = date_or_datetime.astimezone(zoneinfo.ZoneInfo("UTC"))
+        result = date_or_datetime.astimezone(UTC)
     elif type(date_or_datetime) is dt.date:
         result = date_or_datetime
     else:
@@ -74,87 +81,126 @@ def enable_remote_debug(app_config: Config, logger: Logger):
         logger.debug(f"RemoteDebug: General Exception {ex}")
 
 
-class HTMLFilter(HTMLParser):
-    """
-    small helper class to eliminate HTML tags from a text.
-    thanks, https://stackoverflow.com/a/55825140
-    """
+def remove_multi_line_comments(text: str) -> str:
+    """Remove multi-line comments"""
+    return MULTI_LINE_COMMENT_PATTERN.sub("", text)
 
-    def __init__(self):
-        super().__init__()
-        self.text = ""
 
-    def handle_data(self, data):
-        self.text += data
+def remove_single_line_comments(text: str) -> str:
+    """Remove single-line comments"""
+    return SINGLE_LINE_COMMENT_PATTERN.sub("", text)
 
 
-def sanitize_link_with_line_breaks(text_input: str) -> str:
-    # handle links with BeautifulSoup
-    soup = BeautifulSoup(text_input, "html.parser")
+def strip_newlines(text: str) -> str:
+    """reduce multiple newlines to max 2 remove strip leading/trailing newlines"""
+    return SURPLUS_NEWLINES_PATTERN.sub("", text)
 
-    for data in soup(["a"]):
-        brs = data.find_all("br")
-        if len(brs) > 0:
-            pass
 
-        anchor_url = data.get("href")
-        if anchor_url is None:
-            continue
+class DescriptionParser(HTMLParser):
+    """
+    strips HTML from an escaped iCal description in one pass.
+    line breaks and paragraphs become escaped newlines and links are written as "text (url)".
+    text between tags is stripped and joined like BeautifulSoup.stripped_strings does.
+    unlike the former BeautifulSoup pipeline, "<br />" is a line break as well and escaped markup like "&lt;b&gt;"
+    is kept as text instead of being parsed as a tag
+    """
 
-        anchor_text = data.string
-        if anchor_text is None:
-            continue
+    SKIPPED_TAGS = ("script", "style")
 
-        replacement_text = anchor_url
+    def __init__(self):
+        super().__init__()
+        self.parts: list[str] = []
+        self._text = ""
+        self._skip = 0
+        # href and text of the open link. text is None once the link contains other tags
+        self._anchor: tuple[str | None, str | None] | None = None
+
+    def _flush(self):
+        text = self._text.strip()
+        if text:
+            self.parts.append(text)
+        self._text = ""
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "br":
+            self.handle_data("\\n")
+            return
+        if tag in self.SKIPPED_TAGS:
+            self._skip += 1
+            return
+        if self._anchor is not None and self._anchor[1] is not None:
+            # nested tags: keep the link text as it is
+            self._text = self._anchor[1]
+            self._anchor = (None, None)
+        self._flush()
+        if tag == "a":
+            self._anchor = (dict(attrs).get("href"), "")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == "br":
+            self.handle_data("\\n")
+        else:
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS:
+            self._skip = max(self._skip - 1, 0)
+            return
+        if tag == "p":
+            self.handle_data("\\n")
+        if tag == "a" and self._anchor is not None:
+            anchor_url, anchor_text = self._anchor
+            self._anchor = None
+            if anchor_text is not None:
+                self._text = self._link_text(anchor_url, anchor_text) if anchor_url is not None else anchor_text
+        self._flush()
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._anchor is not None and self._anchor[1] is not None:
+            self._anchor = (self._anchor[0], self._anchor[1] + data)
+        else:
+            self._text += data
+
+    @staticmethod
+    def _link_text(anchor_url: str, anchor_text: str) -> str:
+        if not anchor_text:
+            return ""
         amount_line_breaks = anchor_text.count("\\n")
         sanitized_anchor_text = anchor_text.replace("\\n", "")
+        replacement_text = anchor_url
         if anchor_url != sanitized_anchor_text:
             replacement_text = f"{sanitized_anchor_text} ({anchor_url})"
+        return replacement_text + " " + "\\n" * amount_line_breaks
+
+    def text(self) -> str:
+        if self.rawdata.startswith("<"):
+            # unterminated markup at the end is dropped like BeautifulSoup does
+            self.rawdata = ""
+        self.close()
+        if self._anchor is not None:
+            self._text = self._anchor[1] or ""
+            self._anchor = None
+        self._flush()
+        return "".join(self.parts)
+
+
+@lru_cache(maxsize=4096)
+def sanitize_description(text: str) -> str:
+    """
+    remove HTML and comments from an escaped iCal description and reduce newlines.
+    results are cached by the raw description as unchanged events are sanitized on every run
+    """
+    if "<" not in text and "&" not in text:
+        # plain text, nothing to parse
+        text = text.strip()
+    else:
+        parser = DescriptionParser()
+        parser.feed(text)
+        text = parser.text()
 
-        replacement_text += " " + "\\n" * amount_line_breaks
-        print(replacement_text)
-
-        data.string = str(replacement_text)
-
-    text_without_links = "".join(soup.stripped_strings)
-    return text_without_links
-
-
-def remove_html_from_description(text_input: str) -> str:
-    """remove replace HTML line breaks and remove HTML tags"""
-    # handle single line breaks
-    text = text_input.replace("<br>", "\\n")
-    text = text.replace("<br/>", "\\n")
-
-    # handle paragraph (the HTMLFilter will take care of the <p> tag)
-    text = text.replace("</p>", "\\n</p>")
-
-    text_without_links = sanitize_link_with_line_breaks(text)
-
-    # strip other tags
-    f = HTMLFilter()
-    f.feed(text_without_links)
-
-    result = f.text
-    return result
-
-
-def remove_multi_line_comments(text: str) -> str:
-    """Remove multi-line comments"""
-    _reg = r"(?:^\s*#{3}|(?<=\\n)\s*#{3})(?:\\n)?[^#]{3}.*?(?:#{3}\\n|#{3}$)"
-    nocmt = regex.sub(_reg, "", text)
-    return nocmt
-
-
-def remove_single_line_comments(text: str) -> str:
-    """Remove single-line comments"""
-    _reg = r"((?:^\s*#|(?<=\\n)\s*#).*?(?:[^\\]\\n|$))"
-    nocmt = regex.sub(_reg, "", text)
-    return nocmt
-
-
-def strip_newlines(text: str) -> str:
-    """reduce multiple newlines to max 2 remove strip leading/trailing newlines"""
-    _reg = r"(^(?:\s*\\n){1,}|(?<=(?:\s*\\n){2})(?:\s*\\n)*)|((?:\s*\\n)*$)"
-    nocmt = regex.sub(_reg, "", text)
-    return nocmt
+    text = MULTI_LINE_COMMENT_PATTERN.sub("", text)
+    text = SINGLE_LINE_COMMENT_PATTERN.sub("", text)
+    return SURPLUS_NEWLINES_PATTERN.sub("", text)
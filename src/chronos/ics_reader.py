@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+# python lib
+from typing import Iterable, Iterator
+import datetime as dt
+
+# external libs
+import icalendar
+
+
+def unfold_lines(raw_lines: Iterable[str]) -> Iterator[str]:
+    """join folded content lines (RFC 5545, 3.1) and drop line endings"""
+    current = None
+    for raw_line in raw_lines:
+        line = raw_line.rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def split_property(line: str) -> tuple[str, str, str]:
+    """split a content line into upper case name, parameters and value"""
+    colon = line.find(":")
+    if colon < 0:
+        return line.upper(), "", ""
+    head, value = line[:colon], line[colon + 1 :]
+    name, _, params = head.partition(";")
+    return name.upper(), params, value
+
+
+def parse_date_value(value: str) -> dt.date | None:
+    """date part of a DATE or DATE-TIME value. None if it can't be read"""
+    try:
+        return dt.date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+    except (ValueError, IndexError):
+        return None
+
+
+class IcsStream:
+    """
+    tokenizes an iCalendar stream without building the whole calendar.
+    top level calendar properties and VTIMEZONE blocks are collected while VEVENT blocks are yielded one by one.
+    """
+
+    def __init__(self, raw_lines: Iterable[str]):
+        self._lines = unfold_lines(raw_lines)
+        self.properties: dict[str, str] = {}
+        self.timezones: list[list[str]] = []
+
+    def events(self) -> Iterator[list[str]]:
+        """yield content lines of every VEVENT including its BEGIN/END lines"""
+        depth = 0
+        block: list[str] | None = None
+        block_name = None
+
+        for line in self._lines:
+            if not line:
+                continue
+            name, _, value = split_property(line)
+
+            if block is not None:
+                block.append(line)
+                if name == "BEGIN":
+                    depth += 1
+                elif name == "END":
+                    depth -= 1
+                    if depth == 1 and value.upper() == block_name:
+                        if block_name == "VEVENT":
+                            yield block
+                        elif block_name == "VTIMEZONE":
+                            self.timezones.append(block)
+                        block = None
+                continue
+
+            if name == "BEGIN":
+                depth += 1
+                if depth == 2:
+                    block_name = value.upper()
+                    block = [line]
+            elif name == "END":
+                depth -= 1
+            elif depth == 1:
+                self.properties.setdefault(name, value)
+
+    def header_calendar(self) -> icalendar.Calendar:
+        """calendar with the top level properties and timezones read so far but without events"""
+        lines = ["BEGIN:VCALENDAR"]
+        lines += [f"{name}:{value}" for name, value in self.properties.items()]
+        for timezone in self.timezones:
+            lines += timezone
+        lines.append("END:VCALENDAR")
+        return icalendar.Calendar.from_ical("\r\n".join(lines))
+
+
+def event_properties(block: list[str]) -> dict[str, tuple[str, str]]:
+    """cheap scan of the VEVENT own properties as (parameters, value). nested components like VALARM are ignored"""
+    properties = {}
+    depth = 0
+    for line in block[1:-1]:
+        name, params, value = split_property(line)
+        if name == "BEGIN":
+            depth += 1
+        elif name == "END":
+            depth -= 1
+        elif depth == 0:
+            properties.setdefault(name, (params, value))
+    return properties
+
+
+def event_header(block: list[str]) -> dict[str, str]:
+    """cheap scan of the VEVENT own property values (nested components like VALARM are ignored)"""
+    return {name: value for name, (_, value) in event_properties(block).items()}
+
+
+def date_ordinal(value: str | None) -> int:
+    """proleptic ordinal of the date part of a DATE or DATE-TIME value. 0 if it can't be read"""
+    date = parse_date_value(value) if value else None
+    return date.toordinal() if date is not None else 0
+
+
+def parse_date_property(params: str, value: str) -> dt.date | dt.datetime:
+    """DATE or DATE-TIME of a raw property. a TZID parameter is applied to local times"""
+    tzid = None
+    for param in params.split(";"):
+        name, _, param_value = param.partition("=")
+        if name.upper() == "TZID":
+            tzid = param_value.strip('"')
+    return icalendar.vDDDTypes.from_ical(value, timezone=tzid)
+
+
+def parse_event(block: list[str]) -> icalendar.Event:
+    return icalendar.Event.from_ical("\r\n".join(block))
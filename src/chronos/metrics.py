@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+# python lib
+from contextlib import contextmanager
+from pathlib import Path
+import datetime as dt
+import json
+import os
+import threading
+import time
+
+
+class RunMetrics:
+    """
+    measurements of a single run: wall time per stage, per calendar numbers and HTTP traffic.
+    counters may be updated from the read and write threads
+    """
+
+    WRITE_OPERATIONS = ("updated", "created", "deleted")
+
+    def __init__(self):
+        self.started = dt.datetime.now().astimezone()
+        self.duration: float | None = None
+        self.stages: dict[str, float] = {}
+        self.calendars: dict[str, dict] = {}
+        self.http = {"requests": 0, "errors": 0, "bytes_sent": 0, "bytes_received": 0, "methods": {}}
+
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def _calendar(self, cal_name: str) -> dict:
+        calendar = self.calendars.get(cal_name)
+        if calendar is None:
+            calendar = {
+                "read_seconds": None,
+                "read_failed": False,
+                "events_fetched": 0,
+                "events_kept": 0,
+                "filtered": {},
+                "sanitize_writes": 0,
+                "updated": 0,
+                "created": 0,
+                "deleted": 0,
+                "write_failures": 0,
+            }
+            self.calendars[cal_name] = calendar
+        return calendar
+
+    def set_value(self, cal_name: str, key: str, value) -> None:
+        with self._lock:
+            self._calendar(cal_name)[key] = value
+
+    def count(self, cal_name: str, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._calendar(cal_name)[key] += amount
+
+    def count_filtered(self, cal_name: str, reason: str, amount: int = 1) -> None:
+        """count events that are not synced, e.g. confidential, excluded or out of range"""
+        with self._lock:
+            filtered = self._calendar(cal_name)["filtered"]
+            filtered[reason] = filtered.get(reason, 0) + amount
+
+    def record_request(self, method: str, status: int, bytes_sent: int, bytes_received: int) -> None:
+        with self._lock:
+            self.http["requests"] += 1
+            self.http["errors"] += 1 if status >= 400 else 0
+            self.http["bytes_sent"] += bytes_sent
+            self.http["bytes_received"] += bytes_received
+            self.http["methods"][method] = self.http["methods"].get(method, 0) + 1
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "started": self.started.isoformat(),
+                "duration": self.duration,
+                "stages": dict(self.stages),
+                "calendars": json.loads(json.dumps(self.calendars)),
+                "http": json.loads(json.dumps(self.http)),
+            }
+
+    def to_prometheus(self) -> str:
+        """metrics in the Prometheus text exposition format"""
+        data = self.to_dict()
+        lines = []
+
+        def add(name: str, help_text: str, samples: list[tuple[dict, float | int | None]]):
+            lines.append(f"# HELP chronos_{name} {help_text}")
+            lines.append(f"# TYPE chronos_{name} gauge")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_str = ",".join(f'{key}="{_escape_label(str(val))}"' for key, val in labels.items())
+                lines.append(f"chronos_{name}{{{label_str}}} {float(value)}" if label_str else f"chronos_{name} {float(value)}")
+
+        calendars = data["calendars"]
+        add("run_timestamp_seconds", "start of the last run", [({}, self.started.timestamp())])
+        add("run_duration_seconds", "wall time of the last run", [({}, data["duration"])])
+        add("stage_duration_seconds", "wall time per stage of the last run", [({"stage": name}, value) for name, value in data["stages"].items()])
+        add("calendar_read_seconds", "read latency per calendar", [({"calendar": name}, cal["read_seconds"]) for name, cal in calendars.items()])
+        add("calendar_read_failed", "1 if the calendar could not be read", [({"calendar": name}, int(cal["read_failed"])) for name, cal in calendars.items()])
+        add(
+            "calendar_events_fetched",
+            "resources or ICS events received per calendar, before filtering",
+            [({"calendar": name}, cal["events_fetched"]) for name, cal in calendars.items()],
+        )
+        add("calendar_events_kept", "events to sync per calendar", [({"calendar": name}, cal["events_kept"]) for name, cal in calendars.items()])
+        add(
+            "calendar_events_filtered",
+            "events not synced per calendar and reason",
+            [({"calendar": name, "reason": reason}, amount) for name, cal in calendars.items() for reason, amount in cal["filtered"].items()],
+        )
+        add(
+            "calendar_sanitize_writes",
+            "source events rewritten by sanitizing",
+            [({"calendar": name}, cal["sanitize_writes"]) for name, cal in calendars.items()],
+        )
+        add(
+            "calendar_events_written",
+            "target events written per source calendar and operation",
+            [({"calendar": name, "operation": operation}, cal[operation]) for name, cal in calendars.items() for operation in self.WRITE_OPERATIONS],
+        )
+        add("calendar_write_failures", "failed writes per source calendar", [({"calendar": name}, cal["write_failures"]) for name, cal in calendars.items()])
+        add("http_requests", "HTTP requests of the last run by method", [({"method": method}, amount) for method, amount in data["http"]["methods"].items()])
+        add("http_errors", "HTTP responses with status >= 400", [({}, data["http"]["errors"])])
+        add(
+            "http_bytes",
+            "HTTP payload bytes of the last run",
+            [({"direction": "sent"}, data["http"]["bytes_sent"]), ({"direction": "received"}, data["http"]["bytes_received"])],
+        )
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_file: Path | None = None, prometheus_file: Path | None = None) -> None:
+        """write metrics files. files are replaced atomically, so readers never see partial content"""
+        if json_file is not None:
+            _write_atomic(json_file, json.dumps(self.to_dict(), indent=2))
+        if prometheus_file is not None:
+            _write_atomic(prometheus_file, self.to_prometheus())
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_atomic(filename: Path, content: str) -> None:
+    tmp_filename = filename.with_name(f".{filename.name}.tmp")
+    with open(tmp_filename, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_filename, filename)
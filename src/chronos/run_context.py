@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+# python lib
+import datetime as dt
+
+# own code
+from chronos.config import Config
+from chronos.helpers import UTC
+
+
+class RunContext:
+    """
+    values fixed for the duration of a run. computed once by the AppFactory and shared by all handlers
+    """
+
+    def __init__(self, app_config: Config, today: dt.date | None = None):
+        self.today = dt.date.today() if today is None else today
+        self.range_min: int = app_config.runtime.range_min
+        self.range_max: int = app_config.runtime.range_max
+
+        # time range searched on the calendars
+        today_in_the_morning_utc = dt.datetime.combine(self.today, dt.time(), tzinfo=UTC)
+        self.limit_start_date = today_in_the_morning_utc + dt.timedelta(days=self.range_min)
+        self.limit_end_date = today_in_the_morning_utc + dt.timedelta(days=self.range_max)
+
+        # events starting after this day are out of range (see ChronosEvent.date_out_of_range).
+        # reduced by a day to bypass assumed day drift in calendar selection
+        self.last_start_date = self.today + dt.timedelta(days=self.range_max - 1)
+
+        # bounds for raw dates as ordinals. timezones are not resolved yet, so a day of tolerance is kept
+        tolerance = dt.timedelta(days=1)
+        self.first_ordinal = (self.limit_start_date - tolerance).date().toordinal()
+        self.last_ordinal = (self.limit_end_date + tolerance).date().toordinal()
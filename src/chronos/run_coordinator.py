@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+# python lib
+from typing import Callable, Iterable
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class RunCoordinator:
+    """
+    guarantees a single run at a time. requests arriving while a run is active are merged into one follow up run.
+    a request covers a set of calendar ids or all calendars (None)
+    """
+
+    def __init__(self, run: Callable[[set[str] | None], None]):
+        self._run = run
+        self._lock = threading.Lock()
+        self._running = False
+        # calendar ids of the next run. None: no run pending. _pending_all: full run
+        self._pending: set[str] | None = None
+        self._pending_all = False
+
+    def _merge(self, calendar_ids: Iterable[str] | None) -> None:
+        if calendar_ids is None:
+            self._pending_all = True
+            self._pending = set()
+        elif not self._pending_all:
+            self._pending = (self._pending or set()) | set(calendar_ids)
+
+    def _take(self) -> tuple[bool, set[str] | None]:
+        """return (has_pending, calendar ids) and clear the pending request"""
+        if self._pending_all:
+            self._pending, self._pending_all = None, False
+            return True, None
+        pending, self._pending = self._pending, None
+        return pending is not None, pending
+
+    def request(self, calendar_ids: Iterable[str] | None = None) -> bool:
+        """
+        run for the given calendar ids (None for all calendars).
+        runs in the calling thread if no run is active and returns True. else the request is queued and False is returned
+        """
+        with self._lock:
+            self._merge(calendar_ids)
+            if self._running:
+                logger.debug("Run in progress. Request queued")
+                return False
+            self._running = True
+
+        try:
+            while True:
+                with self._lock:
+                    has_pending, pending = self._take()
+                    if not has_pending:
+                        self._running = False
+                        return True
+                self._run(pending)
+        except BaseException:
+            with self._lock:
+                self._running = False
+            raise
+
+
+class PollSchedule:
+    """
+    adaptive polling interval per calendar. after a run without changes the interval is doubled, starting at the time
+    elapsed since the previous poll and limited by max_interval. a change resets it, so the calendar is polled on every tick
+    """
+
+    def __init__(self, max_interval: float):
+        self.max_interval = max_interval
+        self._lock = threading.Lock()
+        self._intervals: dict[str, float] = {}
+        self._last_polls: dict[str, float] = {}
+
+    def is_due(self, calendar_id: str, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last_poll = self._last_polls.get(calendar_id)
+            interval = self._intervals.get(calendar_id, 0.0)
+        if last_poll is None or interval <= 0:
+            return True
+        # cron ticks do not start exactly on time
+        return now - last_poll >= interval * 0.9
+
+    def due(self, calendar_ids: Iterable[str], now: float | None = None) -> set[str]:
+        return {calendar_id for calendar_id in calendar_ids if self.is_due(calendar_id, now)}
+
+    def update(self, calendar_id: str, changed: bool, now: float | None = None) -> float:
+        """record a poll of the calendar and return its next interval"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last_poll = self._last_polls.get(calendar_id)
+            interval = self._intervals.get(calendar_id, 0.0)
+            if changed or last_poll is None:
+                interval = 0.0
+            else:
+                interval = min(max(interval * 2, now - last_poll), self.max_interval)
+            self._intervals[calendar_id] = interval
+            self._last_polls[calendar_id] = now
+        return interval
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+# python lib
+from pathlib import Path
+import datetime as dt
+import logging
+import sqlite3
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class StateStore:
+    """
+    local SQLite store for sync state between runs
+
+    calendars   collection url, collection state (ctag, sync-token), end of the read time range and last check per calendar handler
+    resources   raw iCal data of the resources events were read from, keyed by href
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS calendars (
+            chronos_id TEXT PRIMARY KEY,
+            cal_name TEXT,
+            ctag TEXT,
+            sync_token TEXT,
+            last_check TEXT,
+            calendar_url TEXT,
+            window_end TEXT
+        );
+        CREATE TABLE IF NOT EXISTS resources (
+            chronos_id TEXT NOT NULL,
+            href TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (chronos_id, href)
+        );
+    """
+
+    def __init__(self, filename: Path):
+        self.filename = filename
+        self._lock = threading.Lock()
+
+        # calendars are read in parallel, access is serialized by self._lock
+        self._connection = sqlite3.connect(filename, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(self.SCHEMA)
+        logger.debug(f"State store opened: {filename}")
+
+    def load_calendar(self, chronos_id: str) -> tuple[str | None, str | None, dt.datetime | None, dt.datetime | None] | None:
+        """return (ctag, sync_token, window_end, last_check) of the given calendar. None if nothing is stored"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT ctag, sync_token, window_end, last_check FROM calendars WHERE chronos_id = ?",
+                (chronos_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        ctag, sync_token, window_end, last_check = row
+        return (
+            ctag,
+            sync_token,
+            dt.datetime.fromisoformat(window_end) if window_end else None,
+            dt.datetime.fromisoformat(last_check) if last_check else None,
+        )
+
+    def save_calendar(
+        self,
+        chronos_id: str,
+        cal_name: str,
+        ctag: str | None,
+        sync_token: str | None,
+        window_end: dt.datetime | None,
+        last_check: dt.datetime,
+    ) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO calendars (chronos_id, cal_name, ctag, sync_token, window_end, last_check) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (chronos_id) DO UPDATE SET "
+                "cal_name = excluded.cal_name, ctag = excluded.ctag, sync_token = excluded.sync_token, "
+                "window_end = excluded.window_end, last_check = excluded.last_check",
+                (chronos_id, cal_name, ctag, sync_token, window_end.isoformat() if window_end else None, last_check.isoformat()),
+            )
+
+    def load_calendar_url(self, chronos_id: str) -> str | None:
+        """return the resolved collection url of the given calendar. None if it was not resolved yet"""
+        with self._lock:
+            row = self._connection.execute("SELECT calendar_url FROM calendars WHERE chronos_id = ?", (chronos_id,)).fetchone()
+        return row[0] if row else None
+
+    def save_calendar_url(self, chronos_id: str, cal_name: str, calendar_url: str | None) -> None:
+        """store the resolved collection url. None forces a new discovery on the next read"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO calendars (chronos_id, cal_name, calendar_url) VALUES (?, ?, ?) "
+                "ON CONFLICT (chronos_id) DO UPDATE SET cal_name = excluded.cal_name, calendar_url = excluded.calendar_url",
+                (chronos_id, cal_name, calendar_url),
+            )
+
+    def load_resources(self, chronos_id: str) -> dict[str, str]:
+        """return href -> raw iCal data of the given calendar"""
+        with self._lock:
+            rows = self._connection.execute("SELECT href, data FROM resources WHERE chronos_id = ?", (chronos_id,)).fetchall()
+        return dict(rows)
+
+    def save_resources(self, chronos_id: str, changes: dict[str, str | None], replace: bool = False) -> None:
+        """
+        store raw iCal data by href. a value of None removes the resource.
+        with replace=True all other resources of the calendar are dropped.
+        """
+        with self._lock, self._connection:
+            if replace:
+                self._connection.execute("DELETE FROM resources WHERE chronos_id = ?", (chronos_id,))
+            for href, data in changes.items():
+                if data is None:
+                    self._connection.execute("DELETE FROM resources WHERE chronos_id = ? AND href = ?", (chronos_id, href))
+                else:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO resources (chronos_id, href, data) VALUES (?, ?, ?)",
+                        (chronos_id, href, data),
+                    )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# python lib
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+import datetime as dt
+import json
+import os
+
+# typing workaround to prevent circular import (see https://docs.python.org/3/library/typing.html#typing.TYPE_CHECKING)
+if TYPE_CHECKING:
+    from chronos.calendar_handler import CalendarHandler
+    from chronos.chronos_event import ChronosEvent
+
+
+# order the batches are applied in. deletes and updates are independent of creates, so the target shrinks first
+ACTIONS = ("delete", "update", "create")
+
+
+class PlannedWrite:
+    """a single write on the target calendar. the operation is only kept in memory"""
+
+    __slots__ = ("action", "calendar", "event_id", "event", "size", "operation")
+
+    def __init__(self, action: str, calendar: "CalendarPlan", event_id: bytes, event: "ChronosEvent", size: int, operation: Callable):
+        self.action = action
+        self.calendar = calendar
+        self.event_id = event_id
+        # source event for updates and creates, target event for deletes
+        self.event = event
+        # estimated request body in bytes
+        self.size = size
+        self.operation = operation
+
+    def to_dict(self) -> dict:
+        return {
+            "action": self.action,
+            "uid": self.event_id.decode("utf-8", errors="replace"),
+            "date": str(self.event.date),
+            "title": self.event.safe_title,
+            "bytes": self.size,
+        }
+
+
+class CalendarPlan:
+    """writes and filtered events of one source calendar"""
+
+    def __init__(self, calendar: "CalendarHandler"):
+        self.calendar = calendar
+        self.writes: dict[str, list[PlannedWrite]] = {action: [] for action in ACTIONS}
+        # events needing no write by reason, e.g. unchanged or confidential
+        self.skipped: dict[str, int] = {}
+        # results of the applied writes by action and event id
+        self.done: dict[str, dict] = {action: {} for action in ACTIONS}
+
+    def add(self, action: str, event_id: bytes, event: "ChronosEvent", size: int, operation: Callable) -> None:
+        self.writes[action].append(PlannedWrite(action, self, event_id, event, size, operation))
+
+    def skip(self, reason: str) -> None:
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    @property
+    def counts(self) -> dict[str, int]:
+        return {action: len(writes) for action, writes in self.writes.items()}
+
+    @property
+    def size(self) -> int:
+        return sum(write.size for writes in self.writes.values() for write in writes)
+
+    def to_dict(self) -> dict:
+        return {
+            "chronos_id": self.calendar.chronos_id,
+            "cal_name": self.calendar.cal_name,
+            "counts": self.counts,
+            "bytes": self.size,
+            "skipped": dict(sorted(self.skipped.items())),
+            "writes": [write.to_dict() for action in ACTIONS for write in self.writes[action]],
+        }
+
+
+class SyncPlan:
+    """
+    all writes of a run, computed before anything is written. serializes to JSON for dry runs and inspection.
+    apply it with AppFactory.apply_plan
+    """
+
+    def __init__(self):
+        self.created = dt.datetime.now(dt.timezone.utc)
+        self.calendars: list[CalendarPlan] = []
+        # source calendars that could not be read and are not synced
+        self.unreadable: list["CalendarHandler"] = []
+        self.planning_seconds = 0.0
+
+    def add_calendar(self, calendar: "CalendarHandler") -> CalendarPlan:
+        calendar_plan = CalendarPlan(calendar)
+        self.calendars.append(calendar_plan)
+        return calendar_plan
+
+    def batch(self, action: str) -> list[PlannedWrite]:
+        """writes of an action over all calendars. larger writes first, so they don't hold up the end of the batch"""
+        writes = [write for calendar_plan in self.calendars for write in calendar_plan.writes[action]]
+        return sorted(writes, key=lambda write: write.size, reverse=True)
+
+    @property
+    def counts(self) -> dict[str, int]:
+        return {action: sum(calendar_plan.counts[action] for calendar_plan in self.calendars) for action in ACTIONS}
+
+    @property
+    def size(self) -> int:
+        return sum(calendar_plan.size for calendar_plan in self.calendars)
+
+    def summary(self) -> str:
+        counts = self.counts
+        return f"{counts['update']} updates, {counts['delete']} deletes, {counts['create']} creates. About {self.size / 1024:.1f} KiB to write"
+
+    def to_dict(self) -> dict:
+        return {
+            "created": self.created.isoformat(),
+            "planning_seconds": round(self.planning_seconds, 6),
+            "counts": self.counts,
+            "bytes": self.size,
+            "unreadable": [calendar.cal_name for calendar in self.unreadable],
+            "calendars": [calendar_plan.to_dict() for calendar_plan in self.calendars],
+        }
+
+    def write(self, filename: Path) -> None:
+        """write the plan as JSON. the file is replaced atomically"""
+        filename = Path(filename)
+        tmp_filename = filename.with_name(f".{filename.name}.tmp")
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        os.replace(tmp_filename, filename)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+# python lib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from urllib.parse import parse_qs, urlsplit
+import hmac
+import json
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_SIZE = 1024 * 1024
+
+
+def calendar_names(payload) -> list[str]:
+    """
+    calendar references of a webhook payload. supports generic posts ({"calendar": name}) and
+    Nextcloud webhook events, which carry the calendar in event.calendarData
+    """
+    if not isinstance(payload, dict):
+        return []
+    names = [payload[key] for key in ("calendar", "cal_name", "chronos_id") if isinstance(payload.get(key), str)]
+
+    event = payload.get("event")
+    calendar_data = event.get("calendarData") if isinstance(event, dict) else None
+    if isinstance(calendar_data, dict):
+        names += [calendar_data[key] for key in ("{DAV:}displayname", "uri") if isinstance(calendar_data.get(key), str)]
+    return names
+
+
+class WebhookListener:
+    """
+    HTTP listener for change notifications. a POST naming a calendar schedules a sync of that calendar after
+    debounce seconds. further notifications until then are merged into the same sync
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        token: str | None,
+        debounce: float,
+        resolve: Callable[[str], str | None],
+        trigger: Callable[[set[str]], object],
+    ):
+        self.token = token
+        self.debounce = debounce
+        # calendar reference -> chronos id. None if the calendar is unknown
+        self.resolve = resolve
+        self.trigger = trigger
+
+        self._lock = threading.Lock()
+        self._timers: dict[str, threading.Timer] = {}
+        self._thread: threading.Thread | None = None
+
+        self.server = ThreadingHTTPServer((host, port), WebhookHandler)
+        self.server.daemon_threads = True
+        self.server.listener = self
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self.server.server_address[:2]
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.server.serve_forever, name="chronos-webhook", daemon=True)
+        self._thread.start()
+        logger.info(f"Listening for webhooks on {self.address[0]}:{self.address[1]}")
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+
+    def is_authorized(self, header: str | None, query_token: str | None) -> bool:
+        if not self.token:
+            return True
+        supplied = query_token
+        if header and header.lower().startswith("bearer "):
+            supplied = header[7:].strip()
+        return supplied is not None and hmac.compare_digest(supplied.encode("utf-8"), self.token.encode("utf-8"))
+
+    def notify(self, chronos_id: str) -> None:
+        """schedule a sync of the calendar unless one is already waiting"""
+        with self._lock:
+            if chronos_id in self._timers:
+                return
+            timer = threading.Timer(self.debounce, self._fire, args=(chronos_id,))
+            timer.daemon = True
+            self._timers[chronos_id] = timer
+            timer.start()
+
+    def _fire(self, chronos_id: str) -> None:
+        with self._lock:
+            self._timers.pop(chronos_id, None)
+        try:
+            self.trigger({chronos_id})
+        except Exception as ex:
+            logger.error(f"Webhook triggered run failed. Reason: {ex}")
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    server_version = "Chronos"
+
+    def do_POST(self):
+        listener: WebhookListener = self.server.listener
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+
+        if not listener.is_authorized(self.headers.get("Authorization"), query.get("token", [None])[0]):
+            self._respond(401, "unauthorized")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._respond(400, "invalid Content-Length")
+            return
+        if length > MAX_BODY_SIZE:
+            self._respond(413, "payload too large")
+            return
+        body = self.rfile.read(length) if length else b""
+
+        names = query.get("calendar", [])
+        if body:
+            try:
+                names += calendar_names(json.loads(body))
+            except ValueError:
+                self._respond(400, "invalid JSON")
+                return
+
+        chronos_ids = {chronos_id for chronos_id in map(listener.resolve, names) if chronos_id is not None}
+        if not chronos_ids:
+            logger.debug(f"Webhook for unknown calendar: {names}")
+            self._respond(404, "unknown calendar")
+            return
+
+        for chronos_id in chronos_ids:
+            listener.notify(chronos_id)
+        self._respond(202, "accepted")
+
+    def _respond(self, status: int, message: str) -> None:
+        body = json.dumps({"status": message}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")